@@ -0,0 +1,322 @@
+"""Бенчмарк этапов расчета на синтетических данных.
+
+    python bench.py generate bench_data --employees 200 --rows 5000 --xls-share 0.2
+    python bench.py run bench_data --label "после правки"
+
+run замеряет по отдельности: разбор зарплатного файла, поиск сотрудников,
+чтение книг, нечеткий поиск процедур, расчет ЗП, перезапись книг и запись
+ведомости. Результат дописывается строкой JSON в bench_results.jsonl и
+сравнивается с предыдущим замером того же набора данных.
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+SURNAMES = [
+    "ИВАНОВА", "ПЕТРОВА", "СИДОРОВА", "КУЗНЕЦОВА", "СМИРНОВА", "ПОПОВА", "ВАСИЛЬЕВА", "НОВИКОВА",
+    "МОРОЗОВА", "ВОЛКОВА", "СОКОЛОВА", "ЛЕБЕДЕВА", "КОЗЛОВА", "ЕГОРОВА", "ПАВЛОВА", "СЕМЕНОВА",
+]
+SPECIALIZATIONS = [
+    "МАНИКЮР-ПЕДИКЮР", "РЕСНИЦЫ, ВИЗАЖ", "МАССАЖ лица", "МАССАЖ тела", "ЭПИЛЯЦИЯ", "БРОВИ",
+    "КОСМЕТОЛОГИЯ", "ПИРСИНГ", "ШУГАРИНГ", "ПЕРМАНЕНТ",
+]
+PROCEDURES = [
+    "УСЛУГИ СОТРУДНИКАМ", "ТОВАРЫ НА ПРОДАЖУ", "СТРИЖКИ", "УКЛАДКИ", "ОКРАШИВАНИЕ ВОЛОС",
+    "УХОДЫ ДЛЯ ВОЛОС", "РЕСНИЦЫ", "ВИЗАЖ", "МАНИКЮР", "ПЕДИКЮР", "МАССАЖ", *SPECIALIZATIONS,
+    # опечатки для нечеткого поиска
+    "КОСМЕТАЛОГИЯ", "ЭПИЛЯЦИИ", "МАССАЖ тел", "ШУГАРИНК", "ПЕРМАНЕНТНЫЙ", "БРОВЬ",
+]
+HEADER = ["Услуга", "Кол-во", "Цена", "Скидка", "Код", "Кабинет", "Сумма", "Оплата", "Клиент"]
+
+
+def employee_names(count: int) -> list[str]:
+    names = []
+    for idx in range(count):
+        surname = SURNAMES[idx % len(SURNAMES)]
+        suffix = idx // len(SURNAMES)
+        names.append(surname if not suffix else f"{surname[:-1]}{'ЕИОУЫ'[suffix % 5]}{suffix}")
+    return names
+
+
+def generate_zp_file(path: Path, employees: list[str], rng: random.Random) -> None:
+    from openpyxl import Workbook
+
+    book = Workbook()
+    sheet = book.active
+    sheet.title = "расчет ЗП"
+    sheet.append(["Расчет заработной платы"])
+    sheet.append(["Правило", "Сотрудник", "Специализация", "Процент в ЗП", "Примечание"])
+    for group_idx in range(0, len(employees), 3):
+        group = employees[group_idx:group_idx + 3]
+        sheet.append([
+            f"Правило {group_idx // 3 + 1}",
+            "\n".join(f"{name} {name[0]}." for name in group),
+            "\n".join(rng.sample(SPECIALIZATIONS, 3)),
+            rng.choice([0.3, 0.35, 0.4]),
+            None,
+        ])
+        sheet.append([None, None, rng.choice(SPECIALIZATIONS), rng.choice([500.5, 750.5]), "за единицу"])
+        sheet.append([None, None, f"{rng.choice(SPECIALIZATIONS)}\n{rng.choice(SPECIALIZATIONS)}", "300 руб", None])
+    book.save(path)
+
+
+def report_rows(rows: int, rng: random.Random) -> list[list]:
+    start = date(2025, 7, 1) + timedelta(days=rng.randint(0, 2) * 15)
+    end = start + timedelta(days=14)
+    data = [
+        HEADER,
+        [f"Отчет за период с {start:%d.%m.%Y} по {end:%d.%m.%Y}"] + [None] * 8,
+    ]
+    for _ in range(rows):
+        if rng.random() < 0.05:
+            data.append([None] * 9)
+            continue
+        quantity = rng.choice([1, 1, 2, 3, None])
+        price = rng.choice([900, 1500, 2300.5, 3200])
+        data.append([
+            rng.choice(PROCEDURES), quantity, price, rng.choice([0, 5, 10]), rng.randint(1000, 9999),
+            rng.choice(["1", "2", "3"]), price * (quantity or 0), rng.choice(["нал", "карта"]), "Клиент",
+        ])
+    data.append(["Итого"] + [None] * 8)
+    return data
+
+
+def write_xlsx(path: Path, data: list[list]) -> None:
+    from openpyxl import Workbook
+
+    book = Workbook(write_only=True)
+    sheet = book.create_sheet()
+    for row in data:
+        sheet.append(row)
+    book.save(path)
+
+
+def write_xls(path: Path, data: list[list]) -> None:
+    import xlwt
+
+    book = xlwt.Workbook()
+    sheet = book.add_sheet("Отчет")
+    for row_idx, row in enumerate(data):
+        for col_idx, value in enumerate(row):
+            if value is not None:
+                sheet.write(row_idx, col_idx, value)
+    book.save(str(path))
+
+
+def generate(args: argparse.Namespace) -> int:
+    rng = random.Random(args.seed)
+    root = Path(args.path)
+    (root / "zp_file").mkdir(parents=True, exist_ok=True)
+    (root / "files").mkdir(parents=True, exist_ok=True)
+
+    employees = employee_names(args.employees)
+    generate_zp_file(root / "zp_file" / "Расчет ЗП.xlsx", employees, rng)
+
+    xls_share = args.xls_share
+    if xls_share:
+        try:
+            import xlwt  # noqa: F401
+        except ImportError:
+            print("xlwt не установлен, все файлы будут .xlsx", file=sys.stderr)
+            xls_share = 0
+
+    for name in employees:
+        rows = rng.randint(args.rows // 2, args.rows) if args.vary_rows else args.rows
+        data = report_rows(rows, rng)
+        file_name = f"{name.capitalize()} А.Б. отчет"
+        if rng.random() < xls_share:
+            write_xls(root / "files" / f"{file_name}.xls", data)
+        else:
+            write_xlsx(root / "files" / f"{file_name}.xlsx", data)
+
+    meta = {"employees": args.employees, "rows": args.rows, "xls_share": xls_share, "seed": args.seed}
+    with open(root / "bench.json", "w", encoding="utf-8") as file:
+        json.dump(meta, file, ensure_ascii=False)
+    print(f"Сгенерировано: {root} ({args.employees} сотрудников, до {args.rows} строк)")
+    return 0
+
+
+class Timer:
+    def __init__(self):
+        self.stages: dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0) + seconds
+
+    def measure(self, stage: str, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_stages(data_path: Path, out_path: Path, streaming: bool = False) -> tuple[dict, dict]:
+    from calc import CalcZP
+    from config import Config
+    from matching import ProcedureResolver
+    from workbook import EmployeeWorkbook, stream_zp_workbook, sum_numbers
+
+    config = Config(data_path / "config.yaml")
+    config.info_path = data_path / "zp_file" / "Расчет ЗП.xlsx"
+    config.from_files_path = data_path / "files"
+    config.to_files_path = out_path
+    config.zp_cache = False
+    config.streaming_output = streaming
+
+    timer = Timer()
+    calc = CalcZP(config)
+    zp_df = timer.measure("get_zp_df", calc.get_zp_df)
+    calc.zp_df = zp_df
+    resolver = ProcedureResolver(zp_df["Специализация"], config.similarity_ratio, calc.zp_hash)
+    calc.resolver = resolver
+
+    counters = {"files": 0, "rows": 0, "unmatched": 0, "fuzzy_names": 0}
+    for fl in calc.get_files_df():
+        employee = (fl.stem.split(" ")[0]).upper()
+        surnames = timer.measure("match", calc.employee_index.match, employee)
+        if not surnames:
+            counters["unmatched"] += 1
+            continue
+        proc_to_zp = calc.employee_index.get(surnames[0])
+
+        export_fl = out_path / calc.get_export_name(fl)
+        counters["files"] += 1
+        if streaming:
+            # Чтение, расчет и запись идут вперемешку, кусками строк
+            def compute(chunk, first_row):
+                return calc.rules.compute(chunk, proc_to_zp, resolver, first_row)
+
+            period, total, rows = timer.measure(
+                "stream", stream_zp_workbook, fl, export_fl, compute, config.streaming_chunk_rows
+            )
+            counters["rows"] += rows
+            calc.add_to_summary(employee, round(total), period)
+            continue
+
+        workbook = timer.measure("read", EmployeeWorkbook.load, fl)
+        counters["rows"] += len(workbook.rows)
+
+        def resolve():
+            names = {
+                row[0] for row in workbook.rows
+                if row[0] and row[1] and row[0] not in calc.rules.fixed
+                and not calc.rules.get_percent(row[0], proc_to_zp)
+            }
+            resolver.prepare(names)
+            for name in names:
+                resolver.closest(name, proc_to_zp)
+            return len(names)
+
+        counters["fuzzy_names"] += timer.measure("resolve", resolve)
+        zp_row = timer.measure("compute", calc.rules.compute, workbook.rows, proc_to_zp, resolver)
+        timer.measure("rewrite", workbook.add_zp_column, zp_row)
+        timer.measure("save", workbook.save, export_fl)
+
+        total_salary = round(sum_numbers(zp_row))
+        calc.add_to_summary(employee, total_salary, workbook.period)
+
+    def write_summary():
+        calc.summary_df = calc.summary.to_df()
+        calc.save_summary(out_path / "Ведомость.xlsx")
+
+    timer.measure("summary", write_summary)
+    return timer.stages, counters
+
+
+def compare(record: dict, previous: dict | None) -> None:
+    print(f"{'этап':<12}{'сек':>10}{'было':>10}{'изм.':>9}")
+    for stage, seconds in record["stages"].items():
+        line = f"{stage:<12}{seconds:>10.3f}"
+        if previous and stage in previous["stages"]:
+            before = previous["stages"][stage]
+            change = (seconds / before - 1) * 100 if before else 0
+            line += f"{before:>10.3f}{change:>+8.0f}%"
+        print(line)
+    if previous:
+        print(f"сравнение с {previous['revision']} ({previous['label'] or previous['timestamp']})")
+
+
+def run(args: argparse.Namespace) -> int:
+    data_path = Path(args.path).resolve()
+    meta_path = data_path / "bench.json"
+    meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        stages, counters = run_stages(data_path, Path(tmp_dir), args.streaming)
+
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "label": args.label,
+        "python": platform.python_version(),
+        "data": str(data_path),
+        "scale": meta,
+        "streaming": args.streaming,
+        "counters": counters,
+        "stages": {stage: round(seconds, 4) for stage, seconds in stages.items()},
+    }
+
+    results_path = Path(args.results)
+    previous = None
+    if results_path.exists():
+        for line in results_path.read_text(encoding="utf-8").splitlines():
+            old = json.loads(line)
+            if (
+                old.get("scale") == meta
+                and old.get("counters") == counters
+                and old.get("streaming", False) == args.streaming
+            ):
+                previous = old
+    with open(results_path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    print(f"Файлов: {counters['files']}, строк: {counters['rows']}")
+    compare(record, previous)
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк расчета ЗП")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="синтетические входные данные")
+    generate_parser.add_argument("path")
+    generate_parser.add_argument("--employees", type=int, default=10)
+    generate_parser.add_argument("--rows", type=int, default=100)
+    generate_parser.add_argument("--xls-share", type=float, default=0.2, help="доля файлов .xls (нужен xlwt)")
+    generate_parser.add_argument("--vary-rows", action="store_true", help="от rows/2 до rows строк в файле")
+    generate_parser.add_argument("--seed", type=int, default=1)
+    generate_parser.set_defaults(handler=generate)
+
+    run_parser = subparsers.add_parser("run", help="замер этапов")
+    run_parser.add_argument("path")
+    run_parser.add_argument("--results", default="bench_results.jsonl")
+    run_parser.add_argument("--label", default="")
+    run_parser.add_argument("--streaming", action="store_true", help="потоковая обработка книг кусками строк")
+    run_parser.set_defaults(handler=run)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,106 @@
 import os
-import re
 import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from Levenshtein import ratio
-from openpyxl.reader.excel import load_workbook
 
 from config import Config
-
-SPECIALIZATION_MAP = {
-    "МАНИКЮР": "МАНИКЮР-ПЕДИКЮР",
-    "ПЕДИКЮР": "МАНИКЮР-ПЕДИКЮР",
-    "ВИЗАЖ": "РЕСНИЦЫ, ВИЗАЖ",
-    "РЕСНИЦЫ": "РЕСНИЦЫ, ВИЗАЖ",
-    "МАССАЖ": "МАССАЖ лица",
-}
+from line_items import LineItemStore
+from manifest import MANIFEST_NAME, Manifest
+from matching import EmployeeIndex, ProcedureResolver
+from preflight import PreflightReport, check_items
+from profiling import Profiler
+from rules import SalaryRules
+from summary import SalarySummary, period_sort_key, total_row, total_values
+from utils import file_digest
+from workbook import (
+    ConsolidatedWorkbook,
+    EmployeeWorkbook,
+    convert_xls_to_xlsx,
+    find_period,
+    format_period,
+    read_period_dates,
+    store_formula_values,
+    stream_zp_workbook,
+    sum_numbers,
+)
+from zp_cache import get_zp_cache_key, load_zp_cache, save_zp_cache
+
+SUMMARY_NAME = "Ведомость.xlsx"
+# Общая книга результатов (config.consolidated_output): ведомость и листы сотрудников
+CONSOLIDATED_NAME = "Сводная книга ЗП.xlsx"
+# Потоков чтения в конвейерном режиме
+PIPELINE_READERS = 2
+
+
+def explode_zp_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Разворачивает лист "расчет ЗП": строка на каждую пару сотрудник x специализация.
+
+    Сотрудники в ячейке разделены переводом строки, запятой или двумя пробелами,
+    специализации - переводом строки. Порядок строк и индекс - как у исходного листа.
+    """
+    # Сотрудники: пустые куски отбрасываются до strip, как и раньше
+    emp = df["Сотрудник"].str.split(r"\n|,|  ", regex=True).explode()
+    emp = emp[emp.str.len() > 0].str.strip()
+
+    # Специализации: не-строки (NaN, числа) остаются одним значением
+    spec = df["Специализация"].astype(object)
+    is_str = spec.map(lambda value: isinstance(value, str))
+    split = spec[is_str].astype(str).str.split("\n")
+    spec = pd.concat([split, spec[~is_str]]).sort_index(kind="stable").explode()
+    spec = spec[spec.astype(bool)].astype(str).str.strip()
+
+    emp_df = pd.DataFrame({"row": emp.index, "emp_pos": np.arange(len(emp)), "Сотрудник": emp.to_numpy()})
+    spec_df = pd.DataFrame({"row": spec.index, "spec_pos": np.arange(len(spec)), "Специализация": spec.to_numpy()})
+    pairs = emp_df.merge(spec_df, on="row").sort_values(["emp_pos", "spec_pos"], kind="stable")
+    if pairs.empty:
+        return pd.DataFrame(columns=df.columns)
+
+    zp_df = df.loc[pairs["row"]].copy()
+    zp_df["Сотрудник"] = pairs["Сотрудник"].to_numpy()
+    zp_df["Специализация"] = pairs["Специализация"].to_numpy()
+    return zp_df.infer_objects()
+
+
+# Состояние процесса-воркера: заполняется один раз в _init_worker
+_worker_calc = None
+_worker_zp_df = None
+
+
+def _init_worker(
+    config: Config,
+    zp_df: pd.DataFrame,
+    employee_index: EmployeeIndex,
+    resolver: ProcedureResolver,
+    dry_run: bool = False,
+) -> None:
+    """Передает воркеру конфиг, разобранный zp_df, индекс сотрудников и кэш процедур один раз на процесс."""
+    global _worker_calc, _worker_zp_df
+    _worker_calc = CalcZP(config)
+    _worker_calc.resolver = resolver
+    _worker_calc.employee_index = employee_index
+    _worker_calc.dry_run = dry_run
+    _worker_zp_df = zp_df
+
+
+def _calc_zp_task(fl: Path, to_path: Path | None = None) -> tuple[tuple[str, float, str] | None, list[str], dict]:
+    """Обрабатывает один файл в процессе-воркере.
+
+    Возвращает результат, сообщения лога и накопленное воркером (CalcZP.take_updates).
+    """
+    logs = []
+    try:
+        result = _worker_calc.calc_zp(fl, _worker_zp_df, log_callback=logs.append, to_path=to_path)
+    except Exception:
+        # Замеры упавшего файла не нужны следующей задаче этого воркера
+        _worker_calc.profiler.take_updates()
+        raise
+    return result, logs, _worker_calc.take_updates()
 
 
 class CalcZP:
@@ -26,311 +110,868 @@ class CalcZP:
 
         self.zp_df = None
         self.files = None
-
+        self.resolver = None
+        self.employee_index = None
+        self.zp_hash = None
+        self.rules = SalaryRules(config.salary_rules, config.specialization_map)
+        self.profiler = Profiler()
+        self.progress_total = None
+        # Отмена расчета (из другого потока): текущий файл дорабатывается
+        self.cancel_event = threading.Event()
+        # Строки расчета (сотрудник, период, файл, строки) для хранилища items_path
+        self.line_items: list[tuple[str, str, str, list[tuple]]] = []
+        # Пробный расчет: файлы только читаются, проверки файлов - в checks
+        self.dry_run = False
+        self.checks: list[dict] = []
+        self.preflight = None
+        # Общая книга результатов, если расчет пишет все в один файл
+        self.consolidated = None
+
+        self.summary = SalarySummary()
         self.summary_df = None
+        self.summary_long_df = None
         self.periods = set()  # Track unique periods
 
-        self.config.to_files_path.mkdir(parents=True, exist_ok=True)
-
-    def parse_date_period(self, file_path: Path) -> str:
-        """Extract date period from employee file."""
-        try:
-            # Read first few rows to find date string
-            df = pd.read_excel(file_path, nrows=5)
-
-            # Look for date pattern in first few rows
-            for i in range(min(5, len(df))):
-                for col in df.columns:
-                    cell_value = str(df.iloc[i][col])
-                    # Pattern: "за период с 16.07.2025 по 30.07.2025"
-                    pattern = r"с\s+(\d{1,2}\.\d{1,2}\.\d{4})\s+по\s+(\d{1,2}\.\d{1,2}\.\d{4})"
-                    match = re.search(pattern, cell_value)
-                    if match:
-                        start_date, end_date = match.groups()
-                        # Format as "16.07-30.07.2025" (same year always)
-                        start_parts = start_date.split(".")
-                        end_parts = end_date.split(".")
-                        return f"{start_parts[0]}.{start_parts[1]}-{end_parts[0]}.{end_parts[1]}.{end_parts[2]}"
-
-            # If no date found, return default
-            return "Период не найден"
-
-        except Exception as e:
-            print(f"Ошибка чтения даты из {file_path}: {e}")
-            return "Ошибка даты"
+    def scan_periods(self, files: list[Path], log_callback=None) -> dict[Path, tuple[str, str, str] | None]:
+        """Период и даты его начала и конца из шапки каждого файла: (период, начало, конец).
 
-    def get_zp_df(self) -> pd.DataFrame:
-        def split_empls(empls_value: str) -> list[str]:
-            empls_value = [empls_value]
-            for key in ["\n", ",", "  "]:
-                empls_value = [x for emp in empls_value for x in emp.split(key)]
-            return empls_value
+        Читаются только первые строки листов, так что периоды папки можно
+        узнать до расчета. None - период не найден или файл не прочитан.
+        """
+        periods = {}
+        for fl in files:
+            try:
+                dates = read_period_dates(fl)
+            except Exception as e:
+                log_message = f"Ошибка чтения даты из {fl.name}: {e}"
+                print(log_message)
+                if log_callback:
+                    log_callback(log_message)
+                dates = None
+            periods[fl] = (format_period(*dates), *dates) if dates else None
+        return periods
+
+    @staticmethod
+    def plan_periods(periods: dict[Path, tuple[str, str, str] | None]) -> list[str]:
+        """Столбцы ведомости для найденных периодов, в том же порядке, что и в ведомости."""
+        return sorted({period[0] for period in periods.values() if period}, key=period_sort_key)
+
+    def get_zp_df(self, log_callback=None) -> pd.DataFrame:
+        start = time.perf_counter()
+        cache_key = None
+        if self.config.zp_cache:
+            cache_key = get_zp_cache_key(self.config.info_path, self.config.similarity_ratio)
+            self.zp_hash = cache_key["hash"]
+            cached = load_zp_cache(self.config.zp_cache_path, cache_key)
+            if cached is not None:
+                self.employee_index = cached["employee_index"]
+                self.profiler.count("zp_cache_hits")
+                log_message = f"Зарплатный файл загружен из кэша за {time.perf_counter() - start:.3f} с"
+                print(log_message)
+                if log_callback:
+                    log_callback(log_message)
+                return cached["zp_df"]
+        else:
+            self.zp_hash = file_digest(self.config.info_path)
 
         df = pd.read_excel(self.config.info_path, header=1, sheet_name="расчет ЗП")
         df[["Правило", "Сотрудник"]] = df[["Правило", "Сотрудник"]].ffill()
-        rows = []
-
-        for _, row in df.iterrows():
-            empls = split_empls(row["Сотрудник"])
-
-            for emp in empls:
-                if emp:
-                    emp = emp.strip()
-                    try:
-                        spec = row["Специализация"].split("\n")
-                    except AttributeError:
-                        spec = [row["Специализация"]]
-                    for s in spec:
-                        if not s:
-                            continue
-                        s = str(s).strip()
-                        new_row = row.copy()
-                        new_row["Специализация"] = s
-                        new_row["Сотрудник"] = emp
-                        rows.append(new_row)
-        return pd.DataFrame(rows, columns=df.columns)
-
-    def get_files_df(self) -> list[Path]:
+        zp_df = explode_zp_df(df)
+        self.employee_index = EmployeeIndex(zp_df, self.config.similarity_ratio)
+
+        if cache_key is not None:
+            save_zp_cache(
+                self.config.zp_cache_path,
+                cache_key,
+                {"zp_df": zp_df, "employee_index": self.employee_index},
+            )
+        log_message = f"Зарплатный файл разобран за {time.perf_counter() - start:.3f} с"
+        print(log_message)
+        if log_callback:
+            log_callback(log_message)
+        return zp_df
+
+    def get_employee_index(self, zp_df: pd.DataFrame) -> EmployeeIndex:
+        """Индекс сотрудников для zp_df (готовый из get_zp_df, если он для того же zp_df)."""
+        if self.employee_index is None or self.employee_index.zp_df is not zp_df:
+            self.employee_index = EmployeeIndex(zp_df, self.config.similarity_ratio)
+        return self.employee_index
+
+    def get_resolver(self, zp_df: pd.DataFrame) -> ProcedureResolver:
+        return ProcedureResolver(
+            zp_df["Специализация"],
+            self.config.similarity_ratio,
+            self.zp_hash or file_digest(self.config.info_path),
+            self.config.aliases_path,
+        )
+
+    def get_files_df(self, files_path: Path | None = None) -> list[Path]:
         return [
             file
-            for file in self.config.from_files_path.iterdir()
+            for file in (files_path or self.config.from_files_path).iterdir()
             if file.suffix in [".xlsx", ".xls"]
         ]
 
-    def calc_zp(self, fl: Path, zp_df: pd.DataFrame, progress_callback=None, log_callback=None, file_index=0) -> None:
-        def get_proc_to_zp_dict(zp_df: pd.DataFrame) -> dict:
-            proc_to_zp_dict = dict(zip(zp_df["Специализация"], zp_df["Процент в ЗП"]))
-            return proc_to_zp_dict
-
-        def keep_only_digits(input_string: str) -> [int, None]:
-            try:
-                return int(re.sub(r"\D", "", str(input_string)))
-            except ValueError:
-                return
-
-        def get_closest_match(procedure: str, proc_to_zp: dict) -> [str, None]:
-            max_ratio = self.config.similarity_ratio
-            max_proc = None
-            for proc in proc_to_zp:
-                r = ratio(procedure, proc)
-                if r > max_ratio:
-                    max_ratio = r
-                    max_proc = proc
-            return max_proc
-
-        def get_match(first: str, second: str, similarity_ratio: float = 0.8) -> bool:
-            if not first or not second:
-                return False
-            return ratio(first, second) > similarity_ratio
-
-        def convert_xls_to_xlsx(file_path: Path) -> Path:
-            if file_path.suffix.lower() != ".xls":
-                return file_path
-
-            import xlwings as xw
-
-            xlsx_path = file_path.with_suffix(".xlsx")
-
-            app = xw.App(visible=False)
-            try:
-                wb = app.books.open(str(file_path))
-                wb.save(str(xlsx_path))
-                wb.close()
-                os.remove(file_path)
-            finally:
-                app.quit()
-
-            return xlsx_path
-
-        # Этап 1: Копирование файла
+    def get_period_folders(self, paths: list[Path]) -> list[Path]:
+        """Папки периодов: указанные папки, а папка без отчетов - ее подпапки с отчетами."""
+        folders = []
+        for path in paths:
+            if self.get_files_df(path):
+                folders.append(path)
+                continue
+            folders.extend(
+                folder
+                for folder in sorted(path.iterdir())
+                if folder.is_dir() and self.get_files_df(folder)
+            )
+        # Папка, указанная дважды (или и сама, и через корень), считается один раз
+        return list({folder.resolve(): folder for folder in folders}.values())
+
+    def get_output_folders(self, folders: list[Path]) -> list[Path]:
+        """Папки результатов для папок периодов.
+
+        Обычно - подпапка с именем папки периода. Если имена совпадают (2024/07
+        и 2025/07), подпапки повторяют пути папок от их общего корня, чтобы
+        результаты разных папок не затирали друг друга.
+        """
+        names = [folder.name for folder in folders]
+        if len(set(names)) == len(names):
+            return [self.config.to_files_path / name for name in names]
+        resolved = [folder.resolve() for folder in folders]
+        root = Path(os.path.commonpath(resolved))
+        return [self.config.to_files_path / folder.relative_to(root) for folder in resolved]
+
+    def report_progress(self, value: int, progress_callback=None) -> None:
+        """Прогресс: событие для подписчиков профайлера и progress_callback."""
         if progress_callback:
-            progress_callback(file_index * 4 + 1)
-            
-        export_fl = self.config.to_files_path / fl.name
+            progress_callback(value)
+        self.profiler.emit("progress", value=value, total=self.progress_total)
+
+    def prepare_file(
+        self,
+        fl: Path,
+        zp_df: pd.DataFrame,
+        progress_callback=None,
+        log_callback=None,
+        file_index=0,
+        to_path: Path | None = None,
+    ) -> tuple[str, list[str], Path] | None:
+        """Этапы 1-2: путь результата и поиск сотрудника в зарплатном файле.
+
+        Файл сотрудника, которого нет в зарплатном файле, сразу кладется в папку
+        результатов без расчета. Возвращает (сотрудник, подходящие фамилии, путь
+        результата) или None, если файл пропущен.
+        """
+        profiler = self.profiler
+
+        # Этап 1: Подготовка файла
+        self.report_progress(file_index * 4 + 1, progress_callback)
+
+        export_fl = (to_path or self.config.to_files_path) / fl.name
         suffix = export_fl.suffix.lower()
         if suffix == ".xls":
-            shutil.copy(fl, export_fl)
-            
-            # Этап 2: Конвертация .xls в .xlsx
-            if progress_callback:
-                progress_callback(file_index * 4 + 2)
-            export_fl = convert_xls_to_xlsx(export_fl)
+            # Этап 2: .xls читается напрямую (xlrd), результат сохраняется как .xlsx
+            self.report_progress(file_index * 4 + 2, progress_callback)
+            export_fl = export_fl.with_suffix(".xlsx")
         elif suffix == ".xlsx":
-            shutil.copy(fl, export_fl)
             # Этап 2: Пропускаем конвертацию для .xlsx
-            if progress_callback:
-                progress_callback(file_index * 4 + 2)
+            self.report_progress(file_index * 4 + 2, progress_callback)
         else:
             print(f"Файл {fl} имеет неподдерживаемый формат")
-            return
-
-        # Этап 3: Обработка данных
-        if progress_callback:
-            progress_callback(file_index * 4 + 3)
-
-        try:
-            df = pd.read_excel(export_fl)
-            df = df.replace(np.nan, None)
-        except Exception as e:
-            raise Exception(f"Не удалось прочитать Excel файл: {e}")
+            return None
 
         try:
             employee = (export_fl.stem.split(" ")[0]).upper()
         except IndexError:
             raise Exception(f"Неверный формат имени файла: {export_fl.name}")
 
-        zp_df = zp_df[
-            zp_df["Сотрудник"].apply(
-                lambda x: get_match(
-                    employee,
-                    x.split(" ")[0],
-                    self.config.similarity_ratio,
-                ),
+        with profiler.stage("match", fl.name):
+            index = self.get_employee_index(zp_df)
+            if employee not in index.employees:
+                profiler.count("employee_fuzzy")
+            surnames = index.match(employee)
+        if len(surnames) > 1:
+            warning_msg = (
+                f"Сотрудник {employee}: несколько совпадений в зарплатном файле "
+                f"({', '.join(surnames)}), выбран {surnames[0]}"
             )
-        ]
-        if zp_df.empty:
+            print(warning_msg)
+            if log_callback:
+                log_callback(f"ВНИМАНИЕ: {warning_msg}")
+        if not surnames:
             error_msg = f"Сотрудник {employee} не найден в зарплатном файле"
             print(error_msg)
             if log_callback:
                 log_callback(f"ВНИМАНИЕ: {error_msg}")
-            return
+            if self.dry_run:
+                self.checks.append({"file": fl.name, "employee": employee, "surnames": []})
+                return None
+            # Файл без расчета все равно кладем в папку результатов
+            profiler.count("bytes_read", fl.stat().st_size)
+            if suffix == ".xls":
+                with profiler.stage("convert", fl.name):
+                    convert_xls_to_xlsx(fl, export_fl)
+            else:
+                with profiler.stage("copy", fl.name):
+                    shutil.copy(fl, export_fl)
+            profiler.count("bytes_written", export_fl.stat().st_size)
+            return None
+
+        return employee, surnames, export_fl
+
+    def calc_zp(
+        self,
+        fl: Path,
+        zp_df: pd.DataFrame,
+        progress_callback=None,
+        log_callback=None,
+        file_index=0,
+        to_path: Path | None = None,
+    ) -> tuple[str, float, str] | None:
+        """Рассчитывает ЗП по файлу сотрудника.
+
+        Результат сохраняется в to_path (по умолчанию папка результатов из конфига).
+        Возвращает (сотрудник, сумма ЗП, период) или None, если файл пропущен.
+        """
+        profiler = self.profiler
+        prepared = self.prepare_file(fl, zp_df, progress_callback, log_callback, file_index, to_path)
+        if prepared is None:
+            return None
+        employee, surnames, export_fl = prepared
 
-        proc_to_zp = get_proc_to_zp_dict(zp_df)
-
-        zp_row = []
-        for _, row in df.iterrows():
-            procedure = row.iloc[0]
-            quantity = row.iloc[1]
-            all_price = row.iloc[6]
-            if not procedure or not quantity:
-                zp_row.append("")
-                continue
-
-            zp = ""
-
-            match procedure:
-                case "УСЛУГИ СОТРУДНИКАМ":
-                    zp = all_price
-                case "ТОВАРЫ НА ПРОДАЖУ":
-                    zp = all_price * 0.05
-                case "СТРИЖКИ" | "УКЛАДКИ":
-                    zp = all_price * 0.5
-                case "ОКРАШИВАНИЕ ВОЛОС" | "УХОДЫ ДЛЯ ВОЛОС":
-                    zp = (all_price - all_price * 0.1) * 0.5
-                case "РЕСНИЦЫ" | "ВИЗАЖ":
-                    zp = all_price * 0.5
-                case _:
-                    mp = proc_to_zp.get(procedure)
-                    if not mp:
-                        try_procedure = SPECIALIZATION_MAP.get(procedure)
-                        if try_procedure:
-                            mp = proc_to_zp.get(try_procedure)
-                    if not mp:
-                        procedure = get_closest_match(procedure, proc_to_zp)
-                        mp = proc_to_zp.get(procedure)
-                    if isinstance(mp, float):
-                        if mp > 100:
-                            zp = mp * quantity
-                        else:
-                            zp = mp * all_price
-                    elif isinstance(mp, str):
-                        if mp := keep_only_digits(mp):
-                            zp = mp * quantity
-
-            zp_row.append(zp)
-
-        # Load the existing workbook and sheet
-        try:
-            book = load_workbook(export_fl)
-            sheet = book.active
-            new_column_index = sheet.max_column + 1
-
-            # Add the new column to the existing sheet
-            for idx, value in enumerate(
-                zp_row, start=2
-            ):  # Assuming header is in the first row
-                sheet.cell(row=idx, column=new_column_index, value=value)
+        # Этап 3: Обработка данных
+        self.report_progress(file_index * 4 + 3, progress_callback)
+
+        proc_to_zp = self.get_employee_index(zp_df).get(surnames[0])
+
+        if self.dry_run:
+            # Этап 4: Пробный расчет - только значения ячеек, ничего не записывается
+            self.report_progress(file_index * 4 + 4, progress_callback)
+            return self.check_file(fl, employee, surnames, zp_df)
+
+        items = [] if self.config.items_path else None
+
+        if self.consolidated is not None:
+            # Этап 4: Лист сотрудника в общей книге, за один проход по строкам
+            self.report_progress(file_index * 4 + 4, progress_callback)
+            with profiler.stage("sheet", fl.name):
+                try:
+                    period, total, rows = self.consolidated.add_employee(
+                        fl,
+                        employee.capitalize(),
+                        lambda chunk, first_row: self.rules.compute(
+                            chunk, proc_to_zp, self.resolver, first_row, items
+                        ),
+                        self.config.streaming_chunk_rows,
+                    )
+                except Exception as e:
+                    raise Exception(f"Не удалось изменить рабочую книгу: {e}")
+            profiler.count("bytes_read", fl.stat().st_size)
+            profiler.count("rows", rows)
+            if items is not None:
+                self.line_items.append((employee, period, fl.name, items))
+            return employee, round(total), period
+
+        if self.config.streaming_output:
+            # Этап 4: Чтение, расчет и запись кусками строк, за один проход
+            self.report_progress(file_index * 4 + 4, progress_callback)
+            with profiler.stage("stream", fl.name):
+                try:
+                    period, total, rows = stream_zp_workbook(
+                        fl,
+                        export_fl,
+                        lambda chunk, first_row: self.rules.compute(
+                            chunk, proc_to_zp, self.resolver, first_row, items
+                        ),
+                        self.config.streaming_chunk_rows,
+                        self.config.formula_mode,
+                    )
+                except Exception as e:
+                    raise Exception(f"Не удалось изменить рабочую книгу: {e}")
+            profiler.count("bytes_read", fl.stat().st_size)
+            profiler.count("rows", rows)
+            profiler.count("bytes_written", export_fl.stat().st_size)
+            if items is not None:
+                self.line_items.append((employee, period, fl.name, items))
+            return employee, round(total), period
+
+        # Книга читается один раз: строки данных, период и лист для записи
+        workbook = self.read_workbook(fl)
+        total_salary, period = self.apply_zp(fl, workbook, proc_to_zp, items)
+
+        # Этап 4: Сохранение файла
+        self.report_progress(file_index * 4 + 4, progress_callback)
+        self.save_workbook(fl, workbook, export_fl)
+        if items is not None:
+            self.line_items.append((employee, period, fl.name, items))
+
+        return employee, total_salary, period
+
+    def read_workbook(self, fl: Path) -> EmployeeWorkbook:
+        with self.profiler.stage("read", fl.name):
+            try:
+                workbook = EmployeeWorkbook.load(fl)
+            except Exception as e:
+                raise Exception(f"Не удалось прочитать Excel файл: {e}")
+        self.profiler.count("bytes_read", fl.stat().st_size)
+        return workbook
 
-            # Удаляем столбцы E, G и H
-            cols_to_delete = ["H", "G", "E"]
-            for col in cols_to_delete:
-                sheet.delete_cols(sheet[col + "1"].column)
-            new_column_index = new_column_index - 3
+    def read_rows(self, fl: Path) -> list[tuple]:
+        """Только значения ячеек (для пробного расчета)."""
+        with self.profiler.stage("read", fl.name):
+            try:
+                rows = EmployeeWorkbook.load_rows(fl)
+            except Exception as e:
+                raise Exception(f"Не удалось прочитать Excel файл: {e}")
+        self.profiler.count("bytes_read", fl.stat().st_size)
+        return rows
 
-            # Calculate sum of salary values and round to integer
-            total_salary = round(sum(val for val in zp_row if isinstance(val, (int, float))))
+    def apply_zp(
+        self, fl: Path, workbook: EmployeeWorkbook, proc_to_zp: dict, items: list | None = None
+    ) -> tuple[int, str]:
+        """Считает ЗП по строкам книги и добавляет столбец ЗП. Возвращает (сумма ЗП, период)."""
+        profiler = self.profiler
+        profiler.count("rows", len(workbook.rows))
 
-            sum_formula = f"=SUM({sheet.cell(row=2, column=new_column_index).coordinate}:{sheet.cell(row=len(zp_row), column=new_column_index).coordinate})"
-            sheet.cell(row=len(zp_row) + 1, column=new_column_index, value=sum_formula)
+        with profiler.stage("period", fl.name):
+            period = workbook.period
 
-            # Этап 4: Сохранение файла
-            if progress_callback:
-                progress_callback(file_index * 4 + 4)
+        with profiler.stage("compute", fl.name):
+            zp_row = self.rules.compute(workbook.rows, proc_to_zp, self.resolver, items=items)
 
-            book.save(export_fl)
+        # Update the already loaded sheet
+        try:
+            with profiler.stage("rewrite", fl.name):
+                workbook.add_zp_column(zp_row, self.config.formula_mode)
         except Exception as e:
             raise Exception(f"Не удалось изменить рабочую книгу: {e}")
 
-        # Parse date period and add to summary
-        period = self.parse_date_period(fl)
-        self.periods.add(period)
-        self.add_to_summary(employee, total_salary, period)
+        # Calculate sum of salary values and round to integer
+        total_salary = round(sum_numbers(zp_row))
+        return total_salary, period
+
+    def save_workbook(self, fl: Path, workbook: EmployeeWorkbook, export_fl: Path) -> None:
+        with self.profiler.stage("save", fl.name):
+            try:
+                workbook.save(export_fl)
+            except Exception as e:
+                raise Exception(f"Не удалось изменить рабочую книгу: {e}")
+        self.profiler.count("bytes_written", export_fl.stat().st_size)
+
+    def check_file(
+        self, fl: Path, employee: str, surnames: list[str], zp_df: pd.DataFrame, rows: list[tuple] | None = None
+    ) -> tuple[str, float, str]:
+        """Пробный расчет файла: ЗП, процедуры без ставки и нечеткие совпадения - в checks.
+
+        rows - уже прочитанные строки файла (иначе файл читается здесь).
+        """
+        profiler = self.profiler
+        if rows is None:
+            rows = self.read_rows(fl)
+        profiler.count("rows", len(rows))
+
+        index = self.get_employee_index(zp_df)
+        proc_to_zp = index.get(surnames[0])
+        period = find_period(rows)
+        items = []
+        with profiler.stage("compute", fl.name):
+            zp_row = self.rules.compute(rows, proc_to_zp, self.resolver, items=items)
+        total_salary = round(sum_numbers(zp_row))
+
+        unresolved, fuzzy = check_items(items, self.rules.specialization_map, self.resolver)
+        self.checks.append({
+            "file": fl.name,
+            "employee": employee,
+            "surnames": surnames,
+            "employee_score": None if employee in index.employees else index.score(employee, surnames[0]),
+            "period": period,
+            "total": total_salary,
+            "unresolved": unresolved,
+            "fuzzy": fuzzy,
+        })
+        return employee, total_salary, period
 
     def add_to_summary(self, employee: str, total_salary: float, period: str):
-        """Add employee and their total salary to summary DataFrame."""
-        employee_name = employee.capitalize()
-        # Round total_salary to integer
-        total_salary = round(total_salary)
-
-        # Check if employee already exists
-        if employee_name in self.summary_df["Сотрудник"].values:
-            # Update existing row
-            row_idx = self.summary_df[
-                self.summary_df["Сотрудник"] == employee_name
-            ].index[0]
-            # Add period column if it doesn't exist
-            if period not in self.summary_df.columns:
-                self.summary_df[period] = 0
-            self.summary_df.at[row_idx, period] = total_salary
-        else:
-            # Create new row
-            new_row_data = {"Сотрудник": employee_name}
-            # Add zeros for all existing periods
-            for existing_period in self.periods:
-                new_row_data[existing_period] = (
-                    total_salary if existing_period == period else 0
-                )
-
-            new_row = pd.DataFrame([new_row_data])
-            self.summary_df = pd.concat([self.summary_df, new_row], ignore_index=True)
-
-    def calculate(self, progress_callback=None, log_callback=None):
-        self.summary_df = pd.DataFrame(columns=["Сотрудник"])
-        self.periods = set()
+        """Add employee and their total salary to the summary."""
+        self.periods.add(period)
+        self.summary.add(employee, total_salary, period)
+
+    def take_updates(self) -> dict:
+        """Забирает накопленное воркером: кэш процедур, замеры, строки расчета и проверки."""
+        updates = {
+            "resolver": self.resolver.take_updates(),
+            "profiler": self.profiler.take_updates(),
+            "line_items": self.line_items,
+            "checks": self.checks,
+        }
+        self.line_items = []
+        self.checks = []
+        return updates
+
+    def merge_updates(self, updates: dict) -> None:
+        """Добавляет накопленное в процессе-воркере."""
+        self.resolver.merge_updates(*updates["resolver"])
+        self.profiler.merge_updates(*updates["profiler"])
+        self.line_items.extend(updates["line_items"])
+        self.checks.extend(updates["checks"])
+
+    def save_line_items(self, log_callback=None) -> None:
+        """Записывает строки расчета в хранилище items_path, если оно задано."""
+        line_items, self.line_items = self.line_items, []
+        if not self.config.items_path or not line_items:
+            return
+        with self.profiler.stage("items", self.config.items_path.name):
+            with LineItemStore(self.config.items_path) as store:
+                written = store.replace(line_items)
+        self.profiler.count("line_items", written)
+        items_msg = f"Строки расчета сохранены: {written}"
+        print(items_msg)
+        if log_callback:
+            log_callback(items_msg)
 
-        self.zp_df = self.get_zp_df()
-        self.files = self.get_files_df()
+    def save_summary(self, summary_path: Path) -> None:
+        """Сохраняет ведомость с формулами SUM по периодам и строкой ИТОГО."""
+        # Save using ExcelWriter to add formulas
+        with pd.ExcelWriter(summary_path, engine="openpyxl") as writer:
+            self.summary_df.to_excel(writer, index=False, sheet_name="Sheet1")
 
-        if not self.files:
-            print("Нет файлов для обработки")
-            return
+            # Get worksheet to add sum formulas
+            worksheet = writer.sheets["Sheet1"]
 
-        failed_files = []
-        for idx, fl in enumerate(self.files):
-            log_message = f"Обрабатываю файл: {fl.name}"
+            # "ИТОГО" and sum formulas for each period column in the row after last data row
+            last_row = len(self.summary_df) + 1  # +1 for header
+            for col_idx, value in enumerate(total_row(self.summary_df, self.config.formula_mode), start=1):
+                worksheet.cell(row=last_row + 1, column=col_idx, value=value)
+
+        if self.config.formula_mode == "cached":
+            store_formula_values(summary_path, {1: total_values(self.summary_df)})
+
+    def save_consolidated(self, path: Path) -> None:
+        """Дописывает ведомость первым листом общей книги и сохраняет книгу."""
+        summary_df = self.summary_df
+        rows = [list(summary_df.columns)]
+        rows.extend(summary_df.astype(object).values.tolist())
+        rows.append(total_row(summary_df, self.config.formula_mode))
+        cached = self.config.formula_mode == "cached"
+        self.consolidated.write_summary(rows, formula_values=total_values(summary_df) if cached else None)
+        self.consolidated.save(path)
+        self.consolidated = None
+
+    def get_file_label(self, fl: Path, to_path: Path | None = None) -> str:
+        """Имя файла для лога и списка ошибок; в пакетном режиме - с подпапкой результатов."""
+        if to_path is None:
+            return fl.name
+        return f"{to_path.relative_to(self.config.to_files_path).as_posix()}/{fl.name}"
+
+    def calculate_serial(
+        self,
+        files: list[Path],
+        failed_files: list,
+        progress_callback=None,
+        log_callback=None,
+        to_paths: list[Path] | None = None,
+    ) -> list:
+        """Обрабатывает файлы по одному в текущем процессе.
+
+        to_paths - папка результатов для каждого файла (по умолчанию из конфига).
+        """
+        results = []
+        for idx, fl in enumerate(files):
+            if self.cancel_event.is_set():
+                break
+            label = self.get_file_label(fl, to_paths[idx] if to_paths else None)
+            log_message = f"Обрабатываю файл: {label}"
             print(log_message)
             if log_callback:
                 log_callback(log_message)
 
+            to_path = to_paths[idx] if to_paths else None
             try:
-                self.calc_zp(fl, self.zp_df, progress_callback, log_callback, idx)
+                results.append(self.calc_zp(fl, self.zp_df, progress_callback, log_callback, idx, to_path))
             except Exception as e:
-                error_msg = f"ОШИБКА: Не удалось обработать {fl.name}: {str(e)}"
+                error_msg = f"ОШИБКА: Не удалось обработать {label}: {str(e)}"
                 print(error_msg)
                 if log_callback:
                     log_callback(error_msg)
-                failed_files.append((fl.name, str(e)))
+                failed_files.append((label, str(e)))
+                results.append(None)
+        return results
+
+    def calculate_parallel(
+        self,
+        files: list[Path],
+        failed_files: list,
+        progress_callback=None,
+        log_callback=None,
+        to_paths: list[Path] | None = None,
+    ) -> list:
+        """Обрабатывает файлы в пуле процессов.
+
+        zp_df передается каждому воркеру один раз при старте, а не с каждой задачей.
+        Результаты возвращаются в порядке files.
+        """
+        workers = min(self.config.workers, len(files))
+        log_message = f"Параллельный расчет: {workers} процесс(-ов)"
+        print(log_message)
+        if log_callback:
+            log_callback(log_message)
+
+        results = [None] * len(files)
+        errors = {}
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self.config, self.zp_df, self.employee_index, self.resolver, self.dry_run),
+        ) as executor:
+            # Для отмены: еще не начатые файлы снимаются, начатые дорабатываются
+            futures = {
+                executor.submit(_calc_zp_task, fl, to_paths[idx] if to_paths else None): idx
+                for idx, fl in enumerate(files)
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                idx = futures[future]
+                label = self.get_file_label(files[idx], to_paths[idx] if to_paths else None)
+                log_message = f"Обработан файл: {label}"
+                try:
+                    results[idx], logs, updates = future.result()
+                    self.merge_updates(updates)
+                except Exception as e:
+                    errors[idx] = str(e)
+                    log_message = f"ОШИБКА: Не удалось обработать {label}: {str(e)}"
+                    logs = []
+                print(log_message)
+                if log_callback:
+                    log_callback(log_message)
+                    for message in logs:
+                        log_callback(message)
+                self.report_progress(done * 4, progress_callback)
+                if self.cancel_event.is_set():
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    break
+
+        for idx in sorted(errors):
+            failed_files.append((self.get_file_label(files[idx], to_paths[idx] if to_paths else None), errors[idx]))
+        return results
+
+    def calculate_pipelined(
+        self,
+        files: list[Path],
+        failed_files: list,
+        progress_callback=None,
+        log_callback=None,
+        to_paths: list[Path] | None = None,
+    ) -> list:
+        """Обрабатывает файлы в текущем процессе конвейером: чтение, расчет, запись.
+
+        Потоки чтения заранее разбирают следующие книги, сохранение идет в
+        отдельном потоке, расчет - в текущем. На каждом этапе ждут не больше
+        pipeline_depth книг, так что память ограничена. Прогресс, лог и
+        failed_files - как в calculate_serial (ошибки - в порядке файлов).
+        """
+        depth = max(self.config.pipeline_depth, 1)
+        results = [None] * len(files)
+        errors = {}
+        reads = {}
+        writes = deque()
+        next_read = 0
+
+        def log(message: str) -> None:
+            print(message)
+            if log_callback:
+                log_callback(message)
+
+        def prefetch(reader: ThreadPoolExecutor) -> None:
+            # Читаются только файлы, которые будут считаться (сотрудник найден)
+            nonlocal next_read
+            while next_read < len(files) and len(reads) < depth:
+                fl = files[next_read]
+                index = self.get_employee_index(self.zp_df)
+                if fl.suffix.lower() in (".xls", ".xlsx") and index.match(fl.stem.split(" ")[0].upper()):
+                    read = self.read_rows if self.dry_run else self.read_workbook
+                    reads[next_read] = reader.submit(read, fl)
+                next_read += 1
+
+        def finish_write() -> None:
+            idx, label, future, result, items = writes.popleft()
+            try:
+                future.result()
+            except Exception as e:
+                errors[idx] = str(e)
+                log(f"ОШИБКА: Не удалось обработать {label}: {str(e)}")
+                return
+            results[idx] = result
+            if items is not None:
+                self.line_items.append((result[0], result[2], files[idx].name, items))
+
+        with ThreadPoolExecutor(PIPELINE_READERS) as reader, ThreadPoolExecutor(1) as writer:
+            for idx, fl in enumerate(files):
+                if self.cancel_event.is_set():
+                    break
+                prefetch(reader)
+                label = self.get_file_label(fl, to_paths[idx] if to_paths else None)
+                log(f"Обрабатываю файл: {label}")
+
+                to_path = to_paths[idx] if to_paths else None
+                read = reads.pop(idx, None)
+                try:
+                    prepared = self.prepare_file(fl, self.zp_df, progress_callback, log_callback, idx, to_path)
+                    if prepared is None:
+                        continue
+                    employee, surnames, export_fl = prepared
+                    loaded = read.result() if read else None
+
+                    # Этап 3: Обработка данных
+                    self.report_progress(idx * 4 + 3, progress_callback)
+                    if self.dry_run:
+                        # Этап 4: Пробный расчет - ничего не записывается
+                        self.report_progress(idx * 4 + 4, progress_callback)
+                        results[idx] = self.check_file(fl, employee, surnames, self.zp_df, loaded)
+                        continue
+
+                    workbook = loaded or self.read_workbook(fl)
+                    items = [] if self.config.items_path else None
+                    proc_to_zp = self.get_employee_index(self.zp_df).get(surnames[0])
+                    total_salary, period = self.apply_zp(fl, workbook, proc_to_zp, items)
+
+                    # Этап 4: Сохранение файла (в потоке записи)
+                    self.report_progress(idx * 4 + 4, progress_callback)
+                    future = writer.submit(self.save_workbook, fl, workbook, export_fl)
+                    writes.append((idx, label, future, (employee, total_salary, period), items))
+                except Exception as e:
+                    errors[idx] = str(e)
+                    log(f"ОШИБКА: Не удалось обработать {label}: {str(e)}")
+                    continue
+                while len(writes) > depth:
+                    finish_write()
+
+            # При отмене непрочитанные файлы снимаются, начатые записи дописываются
+            reader.shutdown(wait=True, cancel_futures=True)
+            while writes:
+                finish_write()
+
+        for idx in sorted(errors):
+            failed_files.append((self.get_file_label(files[idx], to_paths[idx] if to_paths else None), errors[idx]))
+        return results
+
+    def run_files(
+        self,
+        files: list[Path],
+        failed_files: list,
+        progress_callback=None,
+        log_callback=None,
+        to_paths: list[Path] | None = None,
+    ) -> list:
+        """Обработка файлов в режиме из конфига: пул процессов, конвейер или по одному."""
+        if self.consolidated is not None:
+            # Листы общей книги пишутся в этом процессе
+            return self.calculate_serial(files, failed_files, progress_callback, log_callback, to_paths)
+        if self.config.workers > 1 and len(files) > 1:
+            return self.calculate_parallel(files, failed_files, progress_callback, log_callback, to_paths)
+        # Потоковая запись читает и пишет файл за один проход - конвейеру делить нечего
+        if self.config.pipeline and not self.config.streaming_output and len(files) > 1:
+            return self.calculate_pipelined(files, failed_files, progress_callback, log_callback, to_paths)
+        return self.calculate_serial(files, failed_files, progress_callback, log_callback, to_paths)
+
+    def get_fingerprint(self, fl: Path) -> dict:
+        """Все, от чего зависит результат расчета файла (для манифеста)."""
+        employee = (fl.stem.split(" ")[0]).upper()
+        surnames = self.employee_index.match(employee)
+        return {
+            "input_hash": file_digest(fl),
+            "zp_hash": self.employee_index.digest(surnames[0]) if surnames else None,
+            "rules_version": f"{self.rules.version}:{self.config.similarity_ratio}",
+            # Итоговая формула в книге сотрудника зависит от режима
+            "formula_mode": self.config.formula_mode,
+        }
+
+    @staticmethod
+    def get_export_name(fl: Path) -> str:
+        return fl.name if fl.suffix.lower() == ".xlsx" else fl.with_suffix(".xlsx").name
+
+    def calculate(
+        self, progress_callback=None, log_callback=None, force=False, event_callback=None, dry_run=False
+    ):
+        """Расчет по всем файлам и сохранение ведомости.
+
+        В инкрементальном режиме (config.incremental) неизменившиеся файлы берутся
+        из манифеста; force=True - полный пересчет. event_callback получает
+        события профайлера (этапы и прогресс) словарями. dry_run=True - пробный
+        расчет: файлы только читаются, в папку результатов ничего не пишется,
+        итоги проверки - в self.preflight. Возвращает список (имя файла, ошибка)
+        для файлов, которые не удалось обработать.
+        """
+        self.start_calculation(log_callback, event_callback, dry_run)
+        self.files = self.get_files_df()
+        self.progress_total = len(self.files) * 4 + 1
+
+        if not self.files:
+            log_message = "Нет файлов для обработки"
+            print(log_message)
+            if log_callback:
+                log_callback(log_message)
+            return []
+
+        # Манифест опирается на файлы сотрудников, в общей книге их нет
+        incremental = self.config.incremental and not dry_run and self.consolidated is None
+        manifest = Manifest(self.config.to_files_path / MANIFEST_NAME)
+        results = [None] * len(self.files)
+        fingerprints = {}
+        to_process = []
+        for idx, fl in enumerate(self.files):
+            if incremental:
+                fingerprints[fl.name] = self.get_fingerprint(fl)
+                entry = None
+                if not force:
+                    entry = manifest.lookup(fl.name, fingerprints[fl.name], self.config.to_files_path)
+                if entry is not None:
+                    results[idx] = manifest.result(entry)
+                    continue
+            to_process.append(idx)
+
+        if incremental:
+            log_message = f"Без изменений: {len(self.files) - len(to_process)}, к расчету: {len(to_process)}"
+            print(log_message)
+            if log_callback:
+                log_callback(log_message)
+
+        failed_files = []
+        files = [self.files[idx] for idx in to_process]
+        computed = self.run_files(files, failed_files, progress_callback, log_callback)
+        for idx, result in zip(to_process, computed):
+            results[idx] = result
+
+        if self.cancelled(log_callback):
+            return failed_files
+        if dry_run:
+            self.finish_dry_run(results, failed_files, progress_callback, log_callback)
+            return failed_files
+
+        if incremental:
+            failed = {name for name, _ in failed_files}
+            for idx in to_process:
+                fl = self.files[idx]
+                if fl.name in failed:
+                    manifest.remove(fl.name)
+                else:
+                    manifest.update(fl.name, fingerprints[fl.name], results[idx], self.get_export_name(fl))
+            manifest.retain({fl.name for fl in self.files})
+            manifest.save()
+
+        self.finish_calculation(results, failed_files, progress_callback, log_callback)
+        return failed_files
+
+    def calculate_batch(
+        self, paths: list[Path], progress_callback=None, log_callback=None, event_callback=None, dry_run=False
+    ) -> list:
+        """Расчет по нескольким папкам периодов с одной общей ведомостью.
+
+        paths - папки с отчетами или корневые папки с подпапками периодов.
+        Зарплатный файл разбирается один раз, кэши сопоставления общие, файлы
+        всех папок идут в один пул процессов. Результаты каждой папки
+        сохраняются в подпапку с тем же именем в папке результатов (при
+        совпадении имен - см. get_output_folders), в ведомости -
+        столбец на каждый найденный в отчетах период. dry_run=True - пробный
+        расчет, как в calculate.
+        """
+        self.start_calculation(log_callback, event_callback, dry_run)
+        folders = self.get_period_folders(paths)
+
+        files = []
+        to_paths = []
+        for folder, to_path in zip(folders, self.get_output_folders(folders)):
+            if not dry_run:
+                to_path.mkdir(parents=True, exist_ok=True)
+            folder_files = self.get_files_df(folder)
+            files.extend(folder_files)
+            to_paths.extend([to_path] * len(folder_files))
+        self.files = files
+        self.progress_total = len(files) * 4 + 1
+
+        if not files:
+            log_message = "Нет файлов для обработки"
+            print(log_message)
+            if log_callback:
+                log_callback(log_message)
+            return []
+
+        log_message = f"Папок периодов: {len(folders)}, файлов: {len(files)}"
+        print(log_message)
+        if log_callback:
+            log_callback(log_message)
+
+        failed_files = []
+        results = self.run_files(files, failed_files, progress_callback, log_callback, to_paths)
+
+        if self.cancelled(log_callback):
+            return failed_files
+        if dry_run:
+            self.finish_dry_run(results, failed_files, progress_callback, log_callback)
+            return failed_files
+        self.finish_calculation(results, failed_files, progress_callback, log_callback)
+        return failed_files
+
+    def cancel(self) -> None:
+        """Просит остановить расчет после текущего файла (можно из другого потока)."""
+        self.cancel_event.set()
+
+    def cancelled(self, log_callback=None) -> bool:
+        """Расчет отменен: ведомость и манифест не обновляются, кэш процедур сохраняется."""
+        if not self.cancel_event.is_set():
+            return False
+        self.resolver.save()
+        log_message = "Расчет отменен, ведомость не обновлена"
+        print(log_message)
+        if log_callback:
+            log_callback(log_message)
+        return True
+
+    def start_calculation(self, log_callback=None, event_callback=None, dry_run=False) -> None:
+        """Сбрасывает ведомость и профайлер, разбирает зарплатный файл."""
+        self.cancel_event.clear()
+        self.dry_run = dry_run
+        self.checks = []
+        self.preflight = None
+        self.summary = SalarySummary()
+        self.summary_df = None
+        self.summary_long_df = None
+        self.periods = set()
+        self.profiler = Profiler(event_callback)
+        self.line_items = []
+        self.consolidated = None
+        # Папка результатов создается только для настоящего расчета
+        if not dry_run:
+            self.config.to_files_path.mkdir(parents=True, exist_ok=True)
+        if self.config.consolidated_output and not dry_run:
+            # Общая книга не должна затереть зарплатный файл
+            consolidated_path = self.config.to_files_path / CONSOLIDATED_NAME
+            if consolidated_path.resolve() == self.config.info_path.resolve():
+                raise Exception(f"Общая книга совпадает с зарплатным файлом: {consolidated_path}")
+            self.consolidated = ConsolidatedWorkbook(formula_mode=self.config.formula_mode)
+
+        with self.profiler.stage("zp"):
+            self.zp_df = self.get_zp_df(log_callback)
+        self.resolver = self.get_resolver(self.zp_df)
+
+    def finish_calculation(
+        self, results: list, failed_files: list, progress_callback=None, log_callback=None
+    ) -> None:
+        """Сводит результаты файлов в ведомость и сохраняет ее и кэш процедур."""
+        # Сводим результаты в порядке файлов, как при последовательном расчете
+        for result in results:
+            if result is None:
                 continue
+            employee, total_salary, period = result
+            self.add_to_summary(employee, total_salary, period)
+
+        self.resolver.save()
+        self.profiler.count("procedure_cache_hits", self.resolver.hits)
+        self.profiler.count("procedure_fuzzy", self.resolver.fuzzy)
+        resolver_msg = (
+            f"Поиск процедур: из кэша {self.resolver.hits}, нечеткий поиск {self.resolver.fuzzy}"
+        )
+        print(resolver_msg)
+        if log_callback:
+            log_callback(resolver_msg)
 
         # Log summary if there were any failures
         if failed_files:
@@ -339,52 +980,70 @@ class CalcZP:
             if log_callback:
                 log_callback(summary)
 
-        # Fill missing period columns with 0 for all employees
-        for period in self.periods:
-            if period not in self.summary_df.columns:
-                self.summary_df[period] = 0
-
-        # Sort by surname (assuming surname is first word in "Сотрудник" column)
-        self.summary_df = self.summary_df.sort_values("Сотрудник").reset_index(
-            drop=True
-        )
+        self.save_line_items(log_callback)
 
-        # Round all numeric columns to integers
-        for col in self.summary_df.columns:
-            if col != "Сотрудник":
-                self.summary_df[col] = self.summary_df[col].apply(
-                    lambda x: round(x) if pd.notna(x) and isinstance(x, (int, float)) else (0 if pd.isna(x) else x)
-                )
+        # Ведомость строится один раз: периоды по порядку дат, сотрудники по алфавиту
+        self.summary_df = self.summary.to_df()
+        self.summary_long_df = self.summary.to_long_df()
 
         # Save summary file with formulas
-        summary_path = self.config.to_files_path / "Ведомость.xlsx"
-
-        # Save using ExcelWriter to add formulas
-        with pd.ExcelWriter(summary_path, engine="openpyxl") as writer:
-            self.summary_df.to_excel(writer, index=False, sheet_name="Sheet1")
-
-            # Get workbook and worksheet to add sum formulas
-            workbook = writer.book
-            worksheet = writer.sheets["Sheet1"]
-
-            # Add sum formulas for each period column (skip first column "Сотрудник")
-            last_row = len(self.summary_df) + 1  # +1 for header
-            for col_idx, col_name in enumerate(
-                self.summary_df.columns[1:], start=2
-            ):  # Start from column B
-                col_letter = worksheet.cell(row=1, column=col_idx).column_letter
-                # Add sum formula in the row after last data row
-                sum_formula = f"=SUM({col_letter}2:{col_letter}{last_row})"
-                worksheet.cell(row=last_row + 1, column=col_idx, value=sum_formula)
-
-            # Add "ИТОГО" label in first column of sum row
-            worksheet.cell(row=last_row + 1, column=1, value="ИТОГО")
+        if self.consolidated is not None:
+            summary_path = self.config.to_files_path / CONSOLIDATED_NAME
+            with self.profiler.stage("summary", summary_path.name):
+                self.save_consolidated(summary_path)
+        else:
+            summary_path = self.config.to_files_path / SUMMARY_NAME
+            with self.profiler.stage("summary", summary_path.name):
+                self.save_summary(summary_path)
+        self.profiler.count("bytes_written", summary_path.stat().st_size)
 
         # Финальный этап: Сохранение итогового файла
-        if progress_callback:
-            progress_callback(len(self.files) * 4 + 1)
+        self.report_progress(len(self.files) * 4 + 1, progress_callback)
 
         success_msg = f"Ведомость сохранена: {summary_path.name}"
         print(success_msg)
         if log_callback:
             log_callback(success_msg)
+
+        self.log_stages(log_callback)
+
+    def finish_dry_run(
+        self, results: list, failed_files: list, progress_callback=None, log_callback=None
+    ) -> None:
+        """Сводит проверки файлов в self.preflight; ведомость и книги не сохраняются."""
+        for result in results:
+            if result is not None:
+                self.add_to_summary(*result)
+        self.summary_df = self.summary.to_df()
+        self.summary_long_df = self.summary.to_long_df()
+        self.resolver.save()
+
+        # Проверки из воркеров приходят по мере готовности - сводим в порядке файлов
+        order = {fl.name: idx for idx, fl in enumerate(self.files)}
+        self.preflight = PreflightReport(self.config.similarity_ratio)
+        for check in sorted(self.checks, key=lambda check: order.get(check["file"], 0)):
+            self.preflight.add(check)
+        for message in self.preflight.messages():
+            print(message)
+            if log_callback:
+                log_callback(message)
+
+        if failed_files:
+            summary = f"Завершено с {len(failed_files)} ошибкой(-ами)"
+            print(summary)
+            if log_callback:
+                log_callback(summary)
+
+        self.report_progress(len(self.files) * 4 + 1, progress_callback)
+        self.log_stages(log_callback)
+
+    def log_stages(self, log_callback=None) -> None:
+        """Время по этапам в лог; профиль - в trace_path, если он задан."""
+        stages_msg = "Этапы: " + ", ".join(
+            f"{stage} {seconds:.2f} с" for stage, seconds in self.profiler.totals().items()
+        )
+        print(stages_msg)
+        if log_callback:
+            log_callback(stages_msg)
+        if self.config.trace_path:
+            self.profiler.save_trace(self.config.trace_path)
@@ -0,0 +1,324 @@
+"""Запуск расчета без GUI.
+
+    python -m cli run --files отчеты --out результат --workers 4
+    python -m cli run --files отчеты --dry-run
+    python -m cli watch --files отчеты --out результат
+    python -m cli batch архив/2025 --out результат --workers 8
+    python -m cli convert папка_xls папка_xlsx
+    python -m cli items результат/items.sqlite --specialization "МАССАЖ лица" --since 2025-01-01
+    python -m cli periods архив/2025
+    python -m cli startup
+
+События (прогресс, этапы расчета, лог, итог) выводятся в stdout строками JSON, остальной
+вывод расчета уходит в stderr. Тяжелые модули (pandas, openpyxl, PySide6)
+импортируются только той командой, которой они нужны.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from config import FORMULA_MODES, Config
+
+# Бюджет времени запуска, секунды
+CLI_STARTUP_BUDGET = 0.5
+# Импорт модулей расчета (pandas, numpy, openpyxl) - то, что платит команда run до первого файла
+RUN_STARTUP_BUDGET = 1.5
+GUI_STARTUP_BUDGET = 3.0
+
+
+class EventWriter:
+    """Пишет события строками JSON в отдельный поток."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.start = time.perf_counter()
+        # События приходят и из потоков конвейера - строки не должны перемешиваться
+        self.lock = threading.Lock()
+
+    def emit(self, event: str, **data) -> None:
+        record = {"event": event, "time": round(time.perf_counter() - self.start, 3), **data}
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self.lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+
+def open_event_stream():
+    """Поток событий на исходном stdout; сам stdout (и у дочерних процессов) - в stderr."""
+    sys.stdout.flush()
+    events = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+    os.dup2(2, 1)
+    return events
+
+
+def get_config(args: argparse.Namespace) -> Config:
+    config = Config(args.config)
+    if args.info:
+        config.info_path = Path(args.info)
+    if getattr(args, "files", None):
+        config.from_files_path = Path(args.files)
+    if args.out:
+        config.to_files_path = Path(args.out)
+    if args.workers:
+        config.workers = args.workers
+    if getattr(args, "incremental", False):
+        config.incremental = True
+    if args.zp_cache:
+        config.zp_cache = True
+    if args.streaming:
+        config.streaming_output = True
+    if args.pipeline:
+        config.pipeline = True
+    if getattr(args, "consolidated", False):
+        config.consolidated_output = True
+    if args.formula_mode:
+        config.formula_mode = args.formula_mode
+    if getattr(args, "trace", None):
+        config.trace_path = Path(args.trace)
+    if args.items:
+        config.items_path = Path(args.items)
+    return config
+
+
+def run(args: argparse.Namespace) -> int:
+    config = get_config(args)
+    events = EventWriter(open_event_stream())
+
+    from calc import CalcZP
+
+    calc = CalcZP(config)
+    try:
+        # Папки с отчетами может не быть - это тоже событие error, а не traceback
+        total = len(calc.get_files_df()) * 4 + 1
+        events.emit("start", files_path=config.from_files_path, to_files_path=config.to_files_path, total=total)
+        failed_files = calc.calculate(
+            log_callback=lambda message: events.emit("log", message=message),
+            force=args.force,
+            event_callback=lambda record: events.emit(**record),
+            dry_run=args.dry_run,
+        )
+    except Exception as e:
+        events.emit("error", message=str(e))
+        return 1
+    if calc.preflight is not None:
+        events.emit("preflight", **calc.preflight.to_dict())
+    events.emit("done", failed_files=failed_files or [], counters=calc.profiler.counters)
+    return 1 if failed_files else 0
+
+
+def watch(args: argparse.Namespace) -> int:
+    """Наблюдение за папкой до SIGINT/SIGTERM."""
+    config = get_config(args)
+    events = EventWriter(open_event_stream())
+
+    from watcher import FolderWatcher
+
+    watcher = FolderWatcher(
+        config,
+        interval=args.interval,
+        settle=args.settle,
+        status_path=Path(args.status) if args.status else None,
+        log_callback=lambda message: events.emit("log", message=message),
+        event_callback=lambda record: events.emit(**record),
+    )
+    events.emit("start", files_path=config.from_files_path, status_path=watcher.status_path)
+    watcher.run()
+    events.emit("done", processed=watcher.processed, failed_files=list(watcher.failed_files.items()))
+    return 0
+
+
+def batch(args: argparse.Namespace) -> int:
+    config = get_config(args)
+    events = EventWriter(open_event_stream())
+
+    from calc import CalcZP
+
+    calc = CalcZP(config)
+    events.emit("start", paths=args.paths, to_files_path=config.to_files_path)
+    try:
+        failed_files = calc.calculate_batch(
+            [Path(path) for path in args.paths],
+            log_callback=lambda message: events.emit("log", message=message),
+            event_callback=lambda record: events.emit(**record),
+            dry_run=args.dry_run,
+        )
+    except Exception as e:
+        events.emit("error", message=str(e))
+        return 1
+    if calc.preflight is not None:
+        events.emit("preflight", **calc.preflight.to_dict())
+    events.emit("done", failed_files=failed_files or [], counters=calc.profiler.counters)
+    return 1 if failed_files else 0
+
+
+def convert(args: argparse.Namespace) -> int:
+    events = EventWriter(open_event_stream())
+
+    from workbook import convert_xls_folder
+
+    failed_files = convert_xls_folder(Path(args.from_path), Path(args.to_path), args.workers)
+    events.emit("done", failed_files=failed_files)
+    return 1 if failed_files else 0
+
+
+def items(args: argparse.Namespace) -> int:
+    """Запрос к хранилищу строк расчета: строки или итоги по группам."""
+    events = EventWriter(open_event_stream())
+
+    from line_items import LineItemStore
+
+    filters = {
+        "employee": args.employee,
+        "procedure": args.procedure,
+        "specialization": args.specialization,
+        "since": args.since,
+        "until": args.until,
+    }
+    try:
+        with LineItemStore(Path(args.path)) as store:
+            if args.group_by:
+                df = store.totals(tuple(args.group_by.split(",")), **filters)
+            else:
+                df = store.query(**filters)
+    except Exception as e:
+        events.emit("error", message=str(e))
+        return 1
+    # Пустые значения (NaN) - null в JSON
+    df = df.astype(object).where(df.notna(), None)
+    for record in df.to_dict("records"):
+        events.emit("item", **record)
+    events.emit("done", rows=len(df))
+    return 0
+
+
+def periods(args: argparse.Namespace) -> int:
+    """Периоды отчетов по шапкам файлов (без расчета) и столбцы будущей ведомости."""
+    config = Config(args.config)
+    events = EventWriter(open_event_stream())
+
+    from calc import CalcZP
+
+    calc = CalcZP(config)
+    folders = calc.get_period_folders([Path(path) for path in args.paths])
+    files = [fl for folder in folders for fl in calc.get_files_df(folder)]
+    found = calc.scan_periods(files, lambda message: events.emit("log", message=message))
+    for fl, period in found.items():
+        period, start, end = period or (None, None, None)
+        events.emit("period", file=str(fl), period=period, start=start, end=end)
+    events.emit("done", files=len(files), columns=calc.plan_periods(found))
+    return 0
+
+
+def measure(command: list[str], env: dict | None = None) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, check=True, env=env, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def startup(args: argparse.Namespace) -> int:
+    """Измеряет время запуска CLI, импорта расчета для run и GUI и сравнивает с бюджетом."""
+    events = EventWriter(sys.stdout)
+    root = Path(__file__).resolve().parent
+    ok = True
+
+    cli_time = min(measure([sys.executable, str(root / "cli.py"), "--help"]) for _ in range(args.repeat))
+    events.emit("startup", target="cli", seconds=round(cli_time, 3), budget=CLI_STARTUP_BUDGET)
+    ok &= cli_time <= CLI_STARTUP_BUDGET
+
+    # --help не импортирует calc; команда run импортирует его целиком
+    run_command = [sys.executable, "-c", f"import sys; sys.path.insert(0, {str(root)!r}); import cli, calc"]
+    run_time = min(measure(run_command) for _ in range(args.repeat))
+    events.emit("startup", target="run", seconds=round(run_time, 3), budget=RUN_STARTUP_BUDGET)
+    ok &= run_time <= RUN_STARTUP_BUDGET
+
+    if not args.skip_gui:
+        env = {**os.environ, "QT_QPA_PLATFORM": os.environ.get("QT_QPA_PLATFORM", "offscreen")}
+        gui_command = [sys.executable, str(root / "main.py"), "--startup-check"]
+        gui_time = min(measure(gui_command, env) for _ in range(args.repeat))
+        events.emit("startup", target="gui", seconds=round(gui_time, 3), budget=GUI_STARTUP_BUDGET)
+        ok &= gui_time <= GUI_STARTUP_BUDGET
+
+    return 0 if ok else 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="info-xls", description="Расчет ЗП без GUI")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # Общие настройки расчета для run и watch
+    calc_parser = argparse.ArgumentParser(add_help=False)
+    calc_parser.add_argument("--config", default="config.yaml", help="файл настроек")
+    calc_parser.add_argument("--info", help="файл расчета ЗП")
+    calc_parser.add_argument("--out", help="папка для результатов")
+    calc_parser.add_argument("--workers", type=int, help="количество процессов")
+    calc_parser.add_argument("--zp-cache", action="store_true", help="кэш зарплатного файла")
+    calc_parser.add_argument("--streaming", action="store_true", help="потоковая обработка книг кусками строк (постоянная память)")
+    calc_parser.add_argument("--pipeline", action="store_true", help="чтение и запись книг в потоках параллельно с расчетом")
+    calc_parser.add_argument(
+        "--formula-mode",
+        choices=FORMULA_MODES,
+        help="итоговые SUM: формула, формула с сохраненным значением или только значение",
+    )
+    calc_parser.add_argument("--items", help="сохранять строки расчета в SQLite")
+
+    run_parser = subparsers.add_parser("run", parents=[calc_parser], help="расчет ЗП и ведомости")
+    run_parser.add_argument("--files", help="папка с файлами сотрудников")
+    run_parser.add_argument("--incremental", action="store_true", help="только изменившиеся файлы")
+    run_parser.add_argument("--force", action="store_true", help="полный пересчет")
+    run_parser.add_argument("--trace", help="сохранить профиль расчета (Chrome trace JSON)")
+    run_parser.add_argument("--dry-run", action="store_true", help="пробный расчет: проверка без записи файлов")
+    run_parser.add_argument("--consolidated", action="store_true", help="все результаты одной книгой: ведомость и лист на сотрудника")
+    run_parser.set_defaults(handler=run)
+
+    watch_parser = subparsers.add_parser("watch", parents=[calc_parser], help="наблюдение за папкой с файлами")
+    watch_parser.add_argument("--files", help="папка с файлами сотрудников")
+    watch_parser.add_argument("--interval", type=float, help="период опроса, с")
+    watch_parser.add_argument("--settle", type=float, help="сколько секунд файл не должен меняться")
+    watch_parser.add_argument("--status", help="файл статуса (по умолчанию в папке результатов)")
+    watch_parser.set_defaults(handler=watch)
+
+    batch_parser = subparsers.add_parser("batch", parents=[calc_parser], help="расчет по нескольким периодам")
+    batch_parser.add_argument("paths", nargs="+", help="папки периодов или корневая папка с подпапками")
+    batch_parser.add_argument("--trace", help="сохранить профиль расчета (Chrome trace JSON)")
+    batch_parser.add_argument("--dry-run", action="store_true", help="пробный расчет: проверка без записи файлов")
+    batch_parser.add_argument("--consolidated", action="store_true", help="все результаты одной книгой: ведомость и лист на сотрудника")
+    batch_parser.set_defaults(handler=batch)
+
+    convert_parser = subparsers.add_parser("convert", help="конвертация .xls в .xlsx")
+    convert_parser.add_argument("from_path", help="папка с .xls")
+    convert_parser.add_argument("to_path", help="папка для .xlsx")
+    convert_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    convert_parser.set_defaults(handler=convert)
+
+    items_parser = subparsers.add_parser("items", help="запрос к хранилищу строк расчета")
+    items_parser.add_argument("path", help="файл SQLite со строками расчета")
+    items_parser.add_argument("--employee", help="сотрудник")
+    items_parser.add_argument("--procedure", help="процедура из отчета")
+    items_parser.add_argument("--specialization", help="специализация из зарплатного файла")
+    items_parser.add_argument("--since", help="с даты (ГГГГ-ММ-ДД)")
+    items_parser.add_argument("--until", help="по дату (ГГГГ-ММ-ДД)")
+    items_parser.add_argument("--group-by", help="итоги по столбцам через запятую, например employee,period")
+    items_parser.set_defaults(handler=items)
+
+    periods_parser = subparsers.add_parser("periods", help="периоды отчетов по шапкам файлов")
+    periods_parser.add_argument("paths", nargs="+", help="папки периодов или корневая папка с подпапками")
+    periods_parser.add_argument("--config", default="config.yaml", help="файл настроек")
+    periods_parser.set_defaults(handler=periods)
+
+    startup_parser = subparsers.add_parser("startup", help="проверка времени запуска")
+    startup_parser.add_argument("--repeat", type=int, default=3)
+    startup_parser.add_argument("--skip-gui", action="store_true")
+    startup_parser.set_defaults(handler=startup)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,12 +3,17 @@ from pathlib import Path
 
 import yaml
 
+# Итоговые формулы (SUM по ЗП, ИТОГО ведомости): только формула, формула с
+# сохраненным значением (как после пересчета в Excel) или только значение
+FORMULA_MODES = ("formula", "cached", "values")
+
 
 class Config:
     """Class to handle configuration settings for the application."""
 
-    def __init__(self):
-        params = self.get_config()
+    def __init__(self, config_path: str | Path = "config.yaml"):
+        self.config_path = Path(config_path)
+        params = self.get_config(self.config_path)
 
         self.current_path = Path(os.getcwd())
 
@@ -22,21 +27,67 @@ class Config:
             params.get("files_new_path") or self.current_path / "files_new"
         )
 
+        # Кэш нечеткого сопоставления названий процедур
+        self.aliases_path = Path(
+            params.get("aliases_path") or self.current_path / "zp_file" / "aliases.json"
+        )
+
+        # Правила расчета ЗП (None - значения по умолчанию из rules.py)
+        self.salary_rules = params.get("salary_rules")
+        self.specialization_map = params.get("specialization_map")
+
+        # Кэш разобранного зарплатного файла
+        self.zp_cache = bool(params.get("zp_cache", False))
+        self.zp_cache_path = Path(
+            params.get("zp_cache_path") or self.current_path / "zp_cache.pkl"
+        )
+
         self.passwd = str(params.get("password"))
         self.similarity_ratio = 0.8
+        # Количество процессов для расчета (1 - последовательный режим)
+        self.workers = int(params.get("workers") or 1)
+        # Пересчитывать только изменившиеся файлы (по манифесту в папке результатов)
+        self.incremental = bool(params.get("incremental", False))
+        # Книги сотрудников читаются и пишутся кусками строк (память не растет с размером файла)
+        self.streaming_output = bool(params.get("streaming_output", False))
+        self.streaming_chunk_rows = int(params.get("streaming_chunk_rows") or 5000)
+        # Конвейер в одном процессе: чтение и запись книг в потоках, не больше
+        # pipeline_depth книг в очереди каждого этапа
+        self.pipeline = bool(params.get("pipeline", False))
+        self.pipeline_depth = int(params.get("pipeline_depth") or 4)
+        # Все результаты одной книгой: ведомость и лист на каждого сотрудника
+        self.consolidated_output = bool(params.get("consolidated_output", False))
+        # Как записывать итоговые формулы - один из FORMULA_MODES
+        self.formula_mode = self.check_formula_mode(params.get("formula_mode") or "formula")
+        # Режим наблюдения за папкой: период опроса и сколько секунд файл
+        # не должен меняться, чтобы считаться дописанным
+        self.watch_interval = float(params.get("watch_interval") or 2)
+        self.watch_settle = float(params.get("watch_settle") or 5)
+        # Файл профиля расчета в формате Chrome trace (None - не сохранять)
+        trace_path = params.get("trace_path")
+        self.trace_path = Path(trace_path) if trace_path else None
+        # Хранилище строк расчета (SQLite) для запросов по истории (None - не сохранять)
+        items_path = params.get("items_path")
+        self.items_path = Path(items_path) if items_path else None
 
     @staticmethod
-    def get_config() -> dict:
+    def get_config(config_path: str | Path = "config.yaml") -> dict:
         try:
-            with open("config.yaml", "r") as file:
+            with open(config_path, "r") as file:
                 params = yaml.safe_load(file)
         except FileNotFoundError:
             params = {}
         return params
 
+    @staticmethod
+    def check_formula_mode(value) -> str:
+        if value not in FORMULA_MODES:
+            raise ValueError(f"Неизвестный formula_mode: {value!r} (допустимо: {', '.join(FORMULA_MODES)})")
+        return value
+
     def update_param(self, key: str, value: str) -> None:
         """Update a configuration parameter and save to the config file."""
-        params = self.get_config()
+        params = self.get_config(self.config_path)
         params[key] = value
 
         match key:
@@ -46,10 +97,40 @@ class Config:
                 self.from_files_path = Path(value)
             case "files_new_path":
                 self.to_files_path = Path(value)
+            case "aliases_path":
+                self.aliases_path = Path(value)
             case "password":
                 self.passwd = str(value)
             case "similarity_ratio":
                 self.similarity_ratio = float(value)
+            case "workers":
+                self.workers = int(value)
+            case "incremental":
+                self.incremental = bool(value)
+            case "zp_cache":
+                self.zp_cache = bool(value)
+            case "zp_cache_path":
+                self.zp_cache_path = Path(value)
+            case "streaming_output":
+                self.streaming_output = bool(value)
+            case "streaming_chunk_rows":
+                self.streaming_chunk_rows = int(value)
+            case "pipeline":
+                self.pipeline = bool(value)
+            case "pipeline_depth":
+                self.pipeline_depth = int(value)
+            case "consolidated_output":
+                self.consolidated_output = bool(value)
+            case "formula_mode":
+                self.formula_mode = self.check_formula_mode(value)
+            case "watch_interval":
+                self.watch_interval = float(value)
+            case "watch_settle":
+                self.watch_settle = float(value)
+            case "trace_path":
+                self.trace_path = Path(value) if value else None
+            case "items_path":
+                self.items_path = Path(value) if value else None
 
-        with open("config.yaml", "w") as file:
+        with open(self.config_path, "w") as file:
             yaml.dump(params, file, allow_unicode=True)
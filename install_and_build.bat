@@ -45,7 +45,7 @@ if exist requirements.txt (
     
     echo Installing additional dependencies...
     python -m pip install python-Levenshtein
-    python -m pip install openpyxl
+    python -m pip install openpyxl==3.1.5
     python -m pip install "numpy<2"
 ) else (
     echo requirements.txt not found!
@@ -0,0 +1,150 @@
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+from summary import period_bounds
+
+ITEMS_SCHEMA_VERSION = 1
+# Столбцы строк расчета, по которым можно фильтровать и группировать
+ITEM_COLUMNS = (
+    "employee",
+    "period",
+    "period_start",
+    "period_end",
+    "file",
+    "row",
+    "procedure",
+    "specialization",
+    "quantity",
+    "price",
+    "rule",
+    "rate",
+    "zp",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    employee TEXT NOT NULL,
+    period TEXT NOT NULL,
+    period_start TEXT,
+    period_end TEXT,
+    file TEXT,
+    row INTEGER,
+    procedure TEXT,
+    specialization TEXT,
+    quantity,
+    price,
+    rule TEXT,
+    rate REAL,
+    zp REAL
+);
+CREATE INDEX IF NOT EXISTS items_employee ON items (employee, period_start);
+CREATE INDEX IF NOT EXISTS items_specialization ON items (specialization, period_start);
+CREATE INDEX IF NOT EXISTS items_procedure ON items (procedure, period_start);
+CREATE INDEX IF NOT EXISTS items_period ON items (period);
+"""
+
+
+class LineItemStore:
+    """Строки расчета ЗП в SQLite: по строке на каждую процедуру из отчетов.
+
+    Для каждого сотрудника и периода хранится последний расчет (как в
+    ведомости), так что история запрашивается без открытия книг Excel.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, ITEMS_SCHEMA_VERSION):
+            self.connection.executescript("DROP TABLE IF EXISTS items;")
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {ITEMS_SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "LineItemStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def replace(self, line_items: list[tuple[str, str, str, list[tuple]]]) -> int:
+        """Записывает строки расчета одной транзакцией.
+
+        line_items - (сотрудник, период, файл, строки из SalaryRules.compute);
+        прежние строки того же сотрудника за тот же период удаляются.
+        Возвращает количество записанных строк.
+        """
+        written = 0
+        with self.connection:
+            for employee, period, file, items in line_items:
+                employee = employee.capitalize()
+                bounds = period_bounds(period)
+                start, end = (bounds[0].isoformat(), bounds[1].isoformat()) if bounds else (None, None)
+                self.connection.execute(
+                    "DELETE FROM items WHERE employee = ? AND period = ?", (employee, period)
+                )
+                self.connection.executemany(
+                    f"INSERT INTO items VALUES ({', '.join('?' * len(ITEM_COLUMNS))})",
+                    ((employee, period, start, end, file, *item) for item in items),
+                )
+                written += len(items)
+        return written
+
+    @staticmethod
+    def _where(
+        employee: str | None = None,
+        procedure: str | None = None,
+        specialization: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+    ) -> tuple[str, list]:
+        conditions, params = [], []
+        if employee:
+            conditions.append("employee = ?")
+            params.append(employee.capitalize())
+        if procedure:
+            conditions.append("procedure = ?")
+            params.append(procedure)
+        if specialization:
+            conditions.append("specialization = ?")
+            params.append(specialization)
+        # Даты - ISO (2025-07-16), период попадает, если пересекается с интервалом
+        if since:
+            conditions.append("period_end >= ?")
+            params.append(since)
+        if until:
+            conditions.append("period_start <= ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def query(self, **filters) -> pd.DataFrame:
+        """Строки расчета по фильтрам employee, procedure, specialization, since, until."""
+        where, params = self._where(**filters)
+        return pd.read_sql_query(
+            f"SELECT {', '.join(ITEM_COLUMNS)} FROM items{where} ORDER BY period_start, employee, file, row",
+            self.connection,
+            params=params,
+        )
+
+    def totals(self, by: tuple[str, ...] = ("employee", "period"), **filters) -> pd.DataFrame:
+        """Количество строк, сумма количества и ЗП с группировкой по столбцам by."""
+        if not by:
+            raise ValueError("Не заданы столбцы для группировки")
+        unknown = [column for column in by if column not in ITEM_COLUMNS]
+        if unknown:
+            raise ValueError(f"Неизвестные столбцы для группировки: {', '.join(unknown)}")
+        where, params = self._where(**filters)
+        columns = ", ".join(by)
+        # Период сортируется по дате начала, а не как строка
+        order = ", ".join("MIN(period_start)" if column == "period" else column for column in by)
+        return pd.read_sql_query(
+            f"SELECT {columns}, COUNT(*) AS items, SUM(quantity) AS quantity, SUM(zp) AS zp "
+            f"FROM items{where} GROUP BY {columns} ORDER BY {order}",
+            self.connection,
+            params=params,
+        )
@@ -1,6 +1,8 @@
+import multiprocessing
 import sys
+import threading
 
-from PySide6.QtCore import Slot
+from PySide6.QtCore import QObject, QThread, QTimer, Signal, Slot
 from PySide6.QtWidgets import (
     QApplication,
     QFileDialog,
@@ -14,9 +16,54 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
-from calc import CalcZP
 from config import Config
 
+# Как часто накопленные строки лога выводятся в окно, мс
+LOG_FLUSH_INTERVAL = 200
+
+
+class CalcWorker(QObject):
+    """Расчет в фоновом потоке; с окном общается только сигналами.
+
+    Модуль расчета (pandas, openpyxl) импортируется и CalcZP создается уже в
+    фоновом потоке, чтобы окно не замирало; отмена идет через cancel_event.
+    """
+
+    event = Signal(dict)
+    log = Signal(str)
+    finished = Signal(list)
+    failed = Signal(str)
+
+    def __init__(self, config: Config, cancel_event: threading.Event):
+        super().__init__()
+        self.config = config
+        self.cancel_event = cancel_event
+
+    @Slot()
+    def run(self):
+        try:
+            from calc import CalcZP
+
+            calc_zp = CalcZP(self.config)
+            calc_zp.cancel_event = self.cancel_event
+            # Отмена, нажатая пока загружался модуль расчета
+            if self.cancel_event.is_set():
+                self.finished.emit([])
+                return
+            failed_files = calc_zp.calculate(
+                log_callback=self.log.emit,
+                event_callback=self.on_event,
+            )
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(failed_files or [])
+
+    def on_event(self, event: dict):
+        # Окну нужен только прогресс; замеры этапов остаются в профайлере
+        if event["event"] == "progress":
+            self.event.emit(event)
+
 
 class MainWindow(QMainWindow):
     def __init__(self, config: Config):
@@ -37,6 +84,9 @@ class MainWindow(QMainWindow):
         self.select_to_button = QPushButton("Выбрать")
         self.start_button = QPushButton("Старт")
         self.start_button.clicked.connect(self.on_start_clicked)
+        self.cancel_button = QPushButton("Отмена")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.on_cancel_clicked)
 
         self.select_zp_button.clicked.connect(self.on_select_file)
         self.select_from_button.clicked.connect(self.on_select_from_dir)
@@ -80,13 +130,25 @@ class MainWindow(QMainWindow):
         """)
         main_layout.addWidget(self.log_window)
 
-        main_layout.addWidget(self.start_button)
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(self.start_button)
+        buttons_layout.addWidget(self.cancel_button)
+        main_layout.addLayout(buttons_layout)
 
         container = QWidget()
         container.setLayout(main_layout)
         self.setCentralWidget(container)
 
-        self.calc_zp = CalcZP(self.config)
+        # Поток и расчет создаются на каждый запуск и удаляются по его завершении
+        self.calc_thread = None
+        self.calc_worker = None
+        self.cancel_event = threading.Event()
+
+        # Строки лога копятся и выводятся пачкой по таймеру
+        self.log_buffer = []
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(LOG_FLUSH_INTERVAL)
+        self.log_timer.timeout.connect(self.flush_log)
 
     @Slot()
     def on_select_file(self):
@@ -123,23 +185,72 @@ class MainWindow(QMainWindow):
 
     @Slot()
     def on_start_clicked(self):
-        # Настраиваем прогресс-бар
-        files_count = len(self.calc_zp.get_files_df())
-        # Учитываем все этапы: для каждого файла (копирование + конвертация + обработка + сохранение) + итоговый файл
-        total_steps = files_count * 4 + 1  # 4 этапа на файл + 1 этап сохранения итогового файла
-        self.progress_bar.setMaximum(total_steps)
+        # Пока зарплатный файл разбирается, прогресс-бар "бегущий";
+        # максимум (4 этапа на файл + итоговый файл) приходит с первым событием
+        self.progress_bar.setRange(0, 0)
+        self.set_running(True)
+
+        self.cancel_event = threading.Event()
+        self.calc_thread = QThread(self)
+        self.calc_worker = CalcWorker(self.config, self.cancel_event)
+        self.calc_worker.moveToThread(self.calc_thread)
+        self.calc_thread.started.connect(self.calc_worker.run)
+        self.calc_worker.event.connect(self.update_progress)
+        self.calc_worker.log.connect(self.log_message)
+        self.calc_worker.finished.connect(self.on_calc_finished)
+        self.calc_worker.failed.connect(self.on_calc_failed)
+        self.calc_worker.finished.connect(self.calc_thread.quit)
+        self.calc_worker.failed.connect(self.calc_thread.quit)
+        self.calc_thread.finished.connect(self.on_thread_finished)
+        self.calc_thread.finished.connect(self.calc_worker.deleteLater)
+        self.calc_thread.finished.connect(self.calc_thread.deleteLater)
+        self.calc_thread.start()
+        self.log_timer.start()
+
+    @Slot()
+    def on_cancel_clicked(self):
+        self.cancel_event.set()
+        self.cancel_button.setEnabled(False)
+        self.log_message("Отмена: расчет остановится после текущего файла")
+
+    @Slot(list)
+    def on_calc_finished(self, failed_files: list):
+        self.set_running(False)
+        # Без событий прогресса (нет файлов) бар так и остался бы "бегущим"
+        if self.cancel_event.is_set() or self.progress_bar.maximum() == 0:
+            self.progress_bar.setRange(0, 1)
+            self.progress_bar.setValue(0)
+
+    @Slot(str)
+    def on_calc_failed(self, message: str):
+        self.set_running(False)
+        self.progress_bar.setRange(0, 1)
         self.progress_bar.setValue(0)
-        
-        # Передаем callback для обновления прогресса и логирования
-        self.calc_zp.calculate(
-            progress_callback=self.update_progress,
-            log_callback=self.log_message
-        )
-        
-    def update_progress(self, current_value):
-        """Обновляет прогресс-бар."""
-        self.progress_bar.setValue(current_value)
-        QApplication.processEvents()  # Обновляем GUI
+        self.log_message(f"ОШИБКА: {message}")
+
+    @Slot()
+    def on_thread_finished(self):
+        # Поток и расчет удаляются через deleteLater
+        self.calc_thread = None
+        self.calc_worker = None
+
+    def set_running(self, running: bool):
+        """Во время расчета доступна только отмена."""
+        for button in (self.start_button, self.select_zp_button, self.select_from_button, self.select_to_button):
+            button.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+        if not running:
+            self.log_timer.stop()
+            self.flush_log()
+
+    @Slot(dict)
+    def update_progress(self, event: dict):
+        """Обновляет прогресс-бар по событиям расчета."""
+        if event["event"] != "progress":
+            return
+        if event.get("total"):
+            self.progress_bar.setMaximum(event["total"])
+        self.progress_bar.setValue(event["value"])
 
     @Slot()
     def toggle_log(self):
@@ -155,20 +266,44 @@ class MainWindow(QMainWindow):
             self.log_toggle_button.setText("Показать лог ▼")
             self.setGeometry(100, 100, 500, 300)  # Исходная высота
 
+    @Slot(str)
     def log_message(self, message: str):
-        """Добавляет сообщение в окно логов."""
-        self.log_window.append(message)
+        """Добавляет сообщение в очередь лога (выводится в flush_log)."""
+        self.log_buffer.append(message)
+        if not self.log_timer.isActive():
+            self.flush_log()
+
+    @Slot()
+    def flush_log(self):
+        """Выводит накопленные сообщения в окно логов одним блоком."""
+        if not self.log_buffer:
+            return
+        self.log_window.append("\n".join(self.log_buffer))
+        self.log_buffer.clear()
         # Авто-прокрутка вниз
         self.log_window.verticalScrollBar().setValue(
             self.log_window.verticalScrollBar().maximum()
         )
-        QApplication.processEvents()
+
+    def closeEvent(self, event):
+        """При закрытии окна во время расчета - отмена и ожидание текущего файла."""
+        if self.calc_thread is not None and self.calc_thread.isRunning():
+            self.cancel_event.set()
+            self.calc_thread.quit()
+            self.calc_thread.wait()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
+    # Нужно для пула процессов в собранном PyInstaller exe
+    multiprocessing.freeze_support()
+
     conf = Config()
 
     app = QApplication(sys.argv)
     window = MainWindow(config=conf)
     window.show()
+    if "--startup-check" in sys.argv:
+        # Замер времени запуска (cli.py startup): закрываемся сразу после показа окна
+        QTimer.singleShot(0, app.quit)
     sys.exit(app.exec())
@@ -0,0 +1,74 @@
+import json
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+class Manifest:
+    """Манифест инкрементального расчета в папке результатов.
+
+    Для каждого входного файла хранит хэш содержимого, хэш строк сотрудника в
+    зарплатном файле, версию правил и результат расчета (сотрудник, сумма,
+    период). Файл пересчитывается, только если что-то из этого изменилось.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        self.load()
+
+    def load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Не удалось прочитать манифест {self.path}: {e}")
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.entries = data.get("files", {})
+
+    def save(self) -> None:
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": MANIFEST_VERSION, "files": self.entries},
+                file,
+                ensure_ascii=False,
+                indent=1,
+            )
+
+    def lookup(self, name: str, fingerprint: dict, output_path: Path) -> dict | None:
+        """Сохраненная запись, если файл не изменился и его результат на месте."""
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        if any(entry.get(key) != value for key, value in fingerprint.items()):
+            return None
+        if entry.get("employee") and not (output_path / entry["output"]).exists():
+            return None
+        return entry
+
+    def update(self, name: str, fingerprint: dict, result: tuple | None, output: str) -> None:
+        employee, total, period = result if result else (None, None, None)
+        self.entries[name] = {
+            **fingerprint,
+            "employee": employee,
+            "total": total,
+            "period": period,
+            "output": output,
+        }
+
+    def remove(self, name: str) -> None:
+        self.entries.pop(name, None)
+
+    def retain(self, names: set[str]) -> None:
+        """Удаляет записи о файлах, которых больше нет в папке."""
+        self.entries = {name: entry for name, entry in self.entries.items() if name in names}
+
+    @staticmethod
+    def result(entry: dict) -> tuple[str, float, str] | None:
+        if not entry.get("employee"):
+            return None
+        return entry["employee"], entry["total"], entry["period"]
@@ -0,0 +1,223 @@
+import hashlib
+import json
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable
+
+from Levenshtein import ratio
+
+# Сколько названий процедур держать в кэше
+ALIASES_MAX_SIZE = 10000
+# Запас для предварительного отбора, чтобы не потерять кандидатов на границе
+_PREFILTER_MARGIN = 1e-6
+
+
+class ProcedureResolver:
+    """Нечеткое сопоставление названий процедур со специализациями.
+
+    Для каждого названия один раз считаются оценки по всем специализациям
+    зарплатного файла; дальше выбор лучшей для конкретного сотрудника - это
+    поиск по словарю. Результаты хранятся в ограниченном кэше и сохраняются
+    на диск, кэш привязан к версии зарплатного файла и порогу схожести.
+    """
+
+    def __init__(
+        self,
+        specializations: Iterable[str],
+        similarity_ratio: float,
+        zp_version: str,
+        aliases_path: Path | None = None,
+        max_size: int = ALIASES_MAX_SIZE,
+    ):
+        self.specializations = list(dict.fromkeys(specializations))
+        self.similarity_ratio = similarity_ratio
+        self.version = f"{zp_version}:{similarity_ratio}"
+        self.aliases_path = aliases_path
+        self.max_size = max_size
+
+        # название процедуры -> {специализация: оценка выше порога}
+        self._cache: OrderedDict[str, dict[str, float]] = OrderedDict()
+        self._learned: dict[str, dict[str, float]] = {}
+
+        self.hits = 0
+        self.fuzzy = 0
+
+        self.load()
+
+    def load(self) -> None:
+        """Загружает сохраненные псевдонимы, если они от той же версии."""
+        if not self.aliases_path or not self.aliases_path.exists():
+            return
+        try:
+            with open(self.aliases_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Не удалось прочитать псевдонимы процедур {self.aliases_path}: {e}")
+            return
+        if data.get("version") != self.version:
+            return
+        for name, candidates in data.get("aliases", {}).items():
+            self._store(name, candidates)
+
+    def save(self) -> None:
+        """Сохраняет кэш псевдонимов на диск."""
+        if not self.aliases_path:
+            return
+        self.aliases_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.aliases_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": self.version, "aliases": dict(self._cache)},
+                file,
+                ensure_ascii=False,
+            )
+
+    def _store(self, name: str, candidates: dict[str, float]) -> None:
+        self._cache[name] = candidates
+        self._cache.move_to_end(name)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def _score(self, names: list[str]) -> list[dict[str, float]]:
+        """Оценивает пачку названий по всем специализациям за один проход."""
+        threshold = self.similarity_ratio
+        try:
+            import numpy as np
+            from rapidfuzz import process
+            from rapidfuzz.distance import Indel
+        except ImportError:
+            return [
+                {spec: r for spec in self.specializations if (r := ratio(name, spec)) > threshold}
+                for name in names
+            ]
+
+        # Матрица оценок считается векторно, точные значения ratio - только для
+        # прошедших предварительный отбор, чтобы выбор совпадал с поштучным
+        matrix = process.cdist(
+            names,
+            self.specializations,
+            scorer=Indel.normalized_similarity,
+            dtype=np.float64,
+            workers=-1,
+        )
+        result = []
+        for name, scores in zip(names, matrix):
+            candidates = {}
+            for col in np.flatnonzero(scores > threshold - _PREFILTER_MARGIN):
+                spec = self.specializations[col]
+                if (r := ratio(name, spec)) > threshold:
+                    candidates[spec] = r
+            result.append(candidates)
+        return result
+
+    def prepare(self, names: Iterable) -> None:
+        """Готовит кэш для пачки названий: неизвестные оцениваются разом."""
+        missing = []
+        for name in dict.fromkeys(names):
+            if not isinstance(name, str):
+                continue
+            if name in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(name)
+            else:
+                missing.append(name)
+        if not missing:
+            return
+
+        self.fuzzy += len(missing)
+        for name, candidates in zip(missing, self._score(missing)):
+            self._store(name, candidates)
+            self._learned[name] = candidates
+
+    def closest(self, procedure, proc_to_zp: dict) -> str | None:
+        """Самая похожая на procedure специализация из proc_to_zp.
+
+        Как и прежний линейный поиск, при равных оценках выбирает первую.
+        """
+        if procedure not in self._cache:
+            self.prepare([procedure])
+        candidates = self._cache.get(procedure)
+        if candidates is None:
+            # Не строка - сравниваем как раньше, по одной
+            candidates = {proc: ratio(procedure, proc) for proc in proc_to_zp}
+
+        max_ratio = self.similarity_ratio
+        max_proc = None
+        for proc in proc_to_zp:
+            r = candidates.get(proc, 0)
+            if r > max_ratio:
+                max_ratio = r
+                max_proc = proc
+        return max_proc
+
+    def score(self, procedure, specialization: str) -> float | None:
+        """Оценка схожести из кэша (None, если название не оценивалось)."""
+        candidates = self._cache.get(procedure)
+        if candidates is None:
+            return None
+        return candidates.get(specialization)
+
+    def take_updates(self) -> tuple[dict[str, dict[str, float]], int, int]:
+        """Забирает новые псевдонимы и счетчики (для сбора из воркеров)."""
+        updates = (self._learned, self.hits, self.fuzzy)
+        self._learned = {}
+        self.hits = 0
+        self.fuzzy = 0
+        return updates
+
+    def merge_updates(self, learned: dict[str, dict[str, float]], hits: int, fuzzy: int) -> None:
+        """Добавляет псевдонимы и счетчики, собранные в другом процессе."""
+        for name, candidates in learned.items():
+            self._store(name, candidates)
+        self.hits += hits
+        self.fuzzy += fuzzy
+
+
+def normalize_surname(name) -> str:
+    """Фамилия (первое слово) в верхнем регистре."""
+    parts = str(name).strip().split(" ")
+    return parts[0].upper()
+
+
+class EmployeeIndex:
+    """Индекс сотрудников зарплатного файла.
+
+    Фамилия -> {специализация: процент в ЗП}. Сначала ищется точное
+    совпадение, нечеткий поиск идет только по списку различных фамилий.
+    """
+
+    def __init__(self, zp_df, similarity_ratio: float):
+        self.zp_df = zp_df
+        self.similarity_ratio = similarity_ratio
+        self.employees: dict[str, dict] = {}
+        for name, spec, percent in zip(zp_df["Сотрудник"], zp_df["Специализация"], zp_df["Процент в ЗП"]):
+            surname = normalize_surname(name)
+            if surname:
+                self.employees.setdefault(surname, {})[spec] = percent
+        self._found: dict[str, list[str]] = {}
+
+    def match(self, employee: str) -> list[str]:
+        """Подходящие фамилии, лучшая первой. Больше одной - неоднозначность."""
+        surname = normalize_surname(employee)
+        if surname in self.employees:
+            return [surname]
+        if surname not in self._found:
+            scores = [
+                (r, candidate)
+                for candidate in self.employees
+                if surname and (r := ratio(surname, candidate)) > self.similarity_ratio
+            ]
+            scores.sort(key=lambda item: item[0], reverse=True)
+            self._found[surname] = [candidate for _, candidate in scores]
+        return self._found[surname]
+
+    def score(self, employee: str, surname: str) -> float:
+        """Оценка схожести фамилии из файла с фамилией из зарплатного файла."""
+        return ratio(normalize_surname(employee), surname)
+
+    def get(self, surname: str) -> dict:
+        return self.employees[surname]
+
+    def digest(self, surname: str) -> str:
+        """Хэш специализаций и процентов сотрудника: меняется вместе с его строками в зарплатном файле."""
+        dump = json.dumps(list(self.employees[surname].items()), ensure_ascii=False, default=str)
+        return hashlib.sha256(dump.encode("utf-8")).hexdigest()
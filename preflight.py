@@ -0,0 +1,121 @@
+from rules import KIND_FIXED, KIND_NAMES, KIND_NONE
+
+# Нечеткое совпадение "у порога": оценка меньше similarity_ratio + запас
+NEAR_THRESHOLD_MARGIN = 0.05
+
+
+def check_items(items: list[tuple], specialization_map: dict, resolver) -> tuple[dict[str, int], list[tuple]]:
+    """Процедуры без ставки (название -> строк) и нечеткие совпадения процедур.
+
+    items - строки из SalaryRules.compute; нечеткое совпадение - это
+    специализация, найденная не по точному названию и не по карте.
+    """
+    unresolved = {}
+    fuzzy = {}
+    for _, procedure, specialization, _, _, rule, _, _ in items:
+        if rule == KIND_NAMES[KIND_NONE]:
+            unresolved[procedure] = unresolved.get(procedure, 0) + 1
+        elif (
+            rule != KIND_NAMES[KIND_FIXED]
+            and specialization != procedure
+            and specialization != specialization_map.get(procedure)
+            and procedure not in fuzzy
+        ):
+            fuzzy[procedure] = (procedure, specialization, resolver.score(procedure, specialization))
+    return unresolved, list(fuzzy.values())
+
+
+class PreflightReport:
+    """Итоги пробного расчета (dry run) по проверкам файлов.
+
+    Сотрудники, не найденные в зарплатном файле или найденные неоднозначно,
+    процедуры без ставки, нечеткие совпадения с оценкой у самого порога и
+    ожидаемая ЗП по сотрудникам.
+    """
+
+    def __init__(self, similarity_ratio: float, margin: float = NEAR_THRESHOLD_MARGIN):
+        self.similarity_ratio = similarity_ratio
+        self.margin = margin
+        self.files = 0
+        self.unmatched: list[dict] = []
+        self.ambiguous: list[dict] = []
+        # процедура -> {"rows": строк, "employees": [сотрудники]}
+        self.unresolved: dict[str, dict] = {}
+        self.near_threshold: list[dict] = []
+        self.totals: dict[tuple[str, str], int] = {}
+
+    def is_near(self, score: float | None) -> bool:
+        return score is not None and score < self.similarity_ratio + self.margin
+
+    def add(self, check: dict) -> None:
+        """Добавляет проверку одного файла (словарь из CalcZP.calc_zp)."""
+        self.files += 1
+        file, employee, surnames = check["file"], check["employee"], check["surnames"]
+        if not surnames:
+            self.unmatched.append({"file": file, "employee": employee})
+            return
+        if len(surnames) > 1:
+            self.ambiguous.append({"file": file, "employee": employee, "candidates": surnames})
+        if self.is_near(check["employee_score"]):
+            self.near_threshold.append({
+                "kind": "employee",
+                "file": file,
+                "name": employee,
+                "match": surnames[0],
+                "score": round(check["employee_score"], 4),
+            })
+
+        for procedure, rows in check["unresolved"].items():
+            entry = self.unresolved.setdefault(str(procedure), {"rows": 0, "employees": []})
+            entry["rows"] += rows
+            if employee not in entry["employees"]:
+                entry["employees"].append(employee)
+        for procedure, specialization, score in check["fuzzy"]:
+            if self.is_near(score):
+                self.near_threshold.append({
+                    "kind": "procedure",
+                    "file": file,
+                    "name": procedure,
+                    "match": specialization,
+                    "score": round(score, 4),
+                })
+
+        # Как в ведомости: повторный файл того же сотрудника за период заменяет предыдущий
+        self.totals[(employee.capitalize(), check["period"])] = check["total"]
+
+    def to_dict(self) -> dict:
+        return {
+            "files": self.files,
+            "unmatched": self.unmatched,
+            "ambiguous": self.ambiguous,
+            "unresolved": self.unresolved,
+            "near_threshold": self.near_threshold,
+            "totals": [
+                {"employee": employee, "period": period, "total": total}
+                for (employee, period), total in sorted(self.totals.items())
+            ],
+        }
+
+    def messages(self) -> list[str]:
+        """Строки для лога."""
+        messages = [
+            f"Пробный расчет: файлов {self.files}, не найдено сотрудников {len(self.unmatched)}, "
+            f"процедур без ставки {len(self.unresolved)}, совпадений у порога {len(self.near_threshold)}"
+        ]
+        for entry in self.unmatched:
+            messages.append(f"ВНИМАНИЕ: Сотрудник {entry['employee']} не найден в зарплатном файле ({entry['file']})")
+        for entry in self.ambiguous:
+            messages.append(
+                f"ВНИМАНИЕ: Сотрудник {entry['employee']}: несколько совпадений ({', '.join(entry['candidates'])})"
+            )
+        for procedure, entry in sorted(self.unresolved.items()):
+            messages.append(
+                f"Процедура без ставки: {procedure} - строк {entry['rows']} ({', '.join(entry['employees'])})"
+            )
+        for entry in self.near_threshold:
+            messages.append(
+                f"Совпадение у порога: {entry['name']} -> {entry['match']} ({entry['score']:.2f}, {entry['file']})"
+            )
+        for (employee, period), total in sorted(self.totals.items()):
+            messages.append(f"{employee} {period}: {total}")
+        return messages
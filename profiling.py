@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+# События, которые передаются из процессов-воркеров (прогресс родитель считает сам)
+TRANSFERABLE_EVENTS = {"stage"}
+
+
+class Profiler:
+    """Замеры этапов и счетчики расчета.
+
+    Каждый этап (чтение, расчет, сохранение файла и т.д.) и каждый отчет о
+    прогрессе - событие-словарь, которое сразу передается подписчикам (GUI,
+    CLI). Счетчики (вызовы нечеткого поиска, попадания в кэш, строки, байты)
+    копятся до конца расчета. Этапы можно замерять из нескольких потоков
+    (конвейерный режим). Все вместе сохраняется в формате Chrome trace
+    (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, callback: Callable[[dict], None] | None = None):
+        self.callback = callback
+        self.start = time.perf_counter()
+        self.events: list[dict] = []
+        self.counters: dict[str, int] = {}
+        self.lock = threading.RLock()
+
+    def emit(self, event: str, **data) -> dict:
+        record = {"event": event, **data}
+        self._dispatch(record)
+        return record
+
+    def _dispatch(self, record: dict) -> None:
+        with self.lock:
+            self.events.append(record)
+            if self.callback:
+                self.callback(record)
+
+    @contextmanager
+    def stage(self, name: str, file: str | None = None):
+        """Замеряет этап; событие отправляется и при ошибке внутри этапа."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.emit(
+                "stage",
+                stage=name,
+                file=file,
+                start=start,
+                duration=round(time.perf_counter() - start, 6),
+                pid=os.getpid(),
+                tid=threading.get_native_id(),
+            )
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def take_updates(self) -> tuple[list[dict], dict[str, int]]:
+        """Забирает события этапов и счетчики (для сбора из воркеров)."""
+        updates = ([event for event in self.events if event["event"] in TRANSFERABLE_EVENTS], self.counters)
+        self.events = []
+        self.counters = {}
+        return updates
+
+    def merge_updates(self, events: list[dict], counters: dict[str, int]) -> None:
+        """Добавляет события и счетчики, собранные в другом процессе."""
+        for event in events:
+            self._dispatch(event)
+        for name, value in counters.items():
+            self.count(name, value)
+
+    def totals(self) -> dict[str, float]:
+        """Суммарное время по этапам, в порядке первого появления."""
+        totals = {}
+        for event in self.events:
+            if event["event"] == "stage":
+                totals[event["stage"]] = totals.get(event["stage"], 0) + event["duration"]
+        return totals
+
+    def to_chrome_trace(self) -> dict:
+        trace_events = []
+        end = self.start
+        for event in self.events:
+            if event["event"] != "stage":
+                continue
+            end = max(end, event["start"] + event["duration"])
+            trace_events.append({
+                "name": event["stage"],
+                "cat": "calc",
+                "ph": "X",
+                "ts": round((event["start"] - self.start) * 1e6),
+                "dur": round(event["duration"] * 1e6),
+                "pid": event["pid"],
+                "tid": event.get("tid", event["pid"]),
+                "args": {"file": event["file"]},
+            })
+        if self.counters:
+            trace_events.append({
+                "name": "counters",
+                "ph": "C",
+                "ts": round((end - self.start) * 1e6),
+                "pid": os.getpid(),
+                "args": self.counters,
+            })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms", "otherData": {"counters": self.counters}}
+
+    def save_trace(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_chrome_trace(), file, ensure_ascii=False)
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+# Процедуры с фиксированной ставкой: ЗП = (сумма - сумма * discount) * percent
+SALARY_RULES = [
+    {"procedures": ["УСЛУГИ СОТРУДНИКАМ"], "percent": 1},
+    {"procedures": ["ТОВАРЫ НА ПРОДАЖУ"], "percent": 0.05},
+    {"procedures": ["СТРИЖКИ", "УКЛАДКИ"], "percent": 0.5},
+    {"procedures": ["ОКРАШИВАНИЕ ВОЛОС", "УХОДЫ ДЛЯ ВОЛОС"], "percent": 0.5, "discount": 0.1},
+    {"procedures": ["РЕСНИЦЫ", "ВИЗАЖ"], "percent": 0.5},
+]
+
+# Процедура из отчета -> специализация в зарплатном файле
+SPECIALIZATION_MAP = {
+    "МАНИКЮР": "МАНИКЮР-ПЕДИКЮР",
+    "ПЕДИКЮР": "МАНИКЮР-ПЕДИКЮР",
+    "ВИЗАЖ": "РЕСНИЦЫ, ВИЗАЖ",
+    "РЕСНИЦЫ": "РЕСНИЦЫ, ВИЗАЖ",
+    "МАССАЖ": "МАССАЖ лица",
+}
+
+# Способ расчета строки
+KIND_NONE = 0  # ЗП не начисляется
+KIND_FIXED = 1  # фиксированная ставка из SALARY_RULES от суммы
+KIND_PRICE = 2  # процент из зарплатного файла от суммы
+KIND_QUANTITY = 3  # ставка за единицу из зарплатного файла
+KIND_NAMES = {KIND_NONE: "none", KIND_FIXED: "fixed", KIND_PRICE: "percent", KIND_QUANTITY: "quantity"}
+
+# Столбцы, которые можно сразу перевести в float64 (пустые ячейки станут NaN)
+_NUMERIC_DTYPES = {"integer", "floating", "mixed-integer-float", "boolean", "empty"}
+
+
+def keep_only_digits(input_string: str) -> [int, None]:
+    try:
+        return int(re.sub(r"\D", "", str(input_string)))
+    except ValueError:
+        return
+
+
+def _to_float(values: list, needed: np.ndarray, column: str, first_row: int = 2) -> np.ndarray:
+    """Столбец чисел как float64; нечисловое значение в нужной строке - ошибка."""
+    if pd.api.types.infer_dtype(values, skipna=True) in _NUMERIC_DTYPES:
+        result = np.array(values, dtype=np.float64)
+        # Пустые ячейки тоже стали NaN - в нужных строках это ошибка
+        for idx in np.flatnonzero(needed & np.isnan(result)).tolist():
+            if values[idx] is None:
+                raise TypeError(f"Строка {first_row + idx}: нечисловое значение в столбце {column}: None")
+        return result
+
+    result = np.full(len(values), np.nan)
+    for idx, value in enumerate(values):
+        if isinstance(value, (int, float)):
+            result[idx] = value
+        elif needed[idx]:
+            raise TypeError(f"Строка {first_row + idx}: нечисловое значение в столбце {column}: {value!r}")
+    return result
+
+
+class SalaryRules:
+    """Правила расчета ЗП по строкам отчета.
+
+    Таблица правил и карта специализаций берутся из конфига (или значения по
+    умолчанию). Для каждой различной процедуры файла способ расчета и ставка
+    определяются один раз, сам расчет идет по столбцам целиком в NumPy.
+    """
+
+    def __init__(self, salary_rules: list[dict] | None = None, specialization_map: dict | None = None):
+        self.salary_rules = salary_rules or SALARY_RULES
+        self.specialization_map = specialization_map or SPECIALIZATION_MAP
+
+        # процедура -> (percent, discount)
+        self.fixed = {}
+        for rule in self.salary_rules:
+            for procedure in rule["procedures"]:
+                self.fixed[procedure] = (float(rule["percent"]), float(rule.get("discount", 0)))
+
+        dump = json.dumps([self.salary_rules, self.specialization_map], ensure_ascii=False, sort_keys=True)
+        self.version = hashlib.sha256(dump.encode("utf-8")).hexdigest()[:16]
+
+    def get_percent(self, procedure, proc_to_zp: dict):
+        """Ставка из зарплатного файла по точному названию или карте специализаций."""
+        mp = proc_to_zp.get(procedure)
+        if not mp:
+            try_procedure = self.specialization_map.get(procedure)
+            if try_procedure:
+                mp = proc_to_zp.get(try_procedure)
+        return mp
+
+    @staticmethod
+    def classify(mp) -> tuple[int, float]:
+        """Способ расчета и множитель для ставки из зарплатного файла.
+
+        Пустая ставка (NaN после read_excel) - это отсутствие ставки: строка
+        попадает в процедуры без ставки, ЗП по ней не начисляется.
+        """
+        if isinstance(mp, float) and mp == mp:
+            if mp > 100:
+                return KIND_QUANTITY, mp
+            return KIND_PRICE, mp
+        if isinstance(mp, str):
+            if mp := keep_only_digits(mp):
+                return KIND_QUANTITY, mp
+        return KIND_NONE, np.nan
+
+    def compute(
+        self, rows: list[tuple], proc_to_zp: dict, resolver=None, first_row: int = 2, items: list | None = None
+    ) -> list:
+        """Столбец ЗП для строк отчета ("" там, где ЗП не начисляется).
+
+        Процедура - столбец A, количество - B, сумма - G. Названия, не найденные
+        ни точно, ни по карте, одной пачкой уходят в resolver. first_row - номер
+        первой из rows строки на листе (для сообщений об ошибках). В items, если
+        он передан, добавляются строки с процедурой и количеством: (номер строки,
+        процедура, специализация, количество, сумма, способ расчета, ставка, ЗП).
+        """
+        procedures = [row[0] for row in rows]
+        quantities = [row[1] for row in rows]
+        prices = [row[6] for row in rows]
+
+        active = np.array(
+            [bool(procedure) and bool(quantity) for procedure, quantity in zip(procedures, quantities)],
+            dtype=bool,
+        )
+        codes, uniques = pd.factorize(pd.Series(procedures, dtype=object)[active])
+
+        # Способ расчета - один раз на каждую различную процедуру
+        kinds = np.zeros(len(uniques), dtype=np.int8)
+        multipliers = np.full(len(uniques), np.nan)
+        discounts = np.zeros(len(uniques))
+        # Специализация зарплатного файла, по которой взята ставка
+        specializations = [None] * len(uniques)
+        unresolved = []
+        for idx, procedure in enumerate(uniques):
+            if procedure in self.fixed:
+                kinds[idx] = KIND_FIXED
+                multipliers[idx], discounts[idx] = self.fixed[procedure]
+                continue
+            mp = self.get_percent(procedure, proc_to_zp)
+            if not mp:
+                unresolved.append(idx)
+            elif proc_to_zp.get(procedure):
+                specializations[idx] = procedure
+            else:
+                specializations[idx] = self.specialization_map.get(procedure)
+            kinds[idx], multipliers[idx] = self.classify(mp)
+
+        if unresolved and resolver is not None:
+            resolver.prepare(uniques[idx] for idx in unresolved)
+            for idx in unresolved:
+                procedure = resolver.closest(uniques[idx], proc_to_zp)
+                specializations[idx] = procedure
+                kinds[idx], multipliers[idx] = self.classify(proc_to_zp.get(procedure))
+
+        # Сам расчет - по столбцам
+        row_kinds = np.zeros(len(rows), dtype=np.int8)
+        row_kinds[active] = kinds[codes]
+        row_multipliers = np.full(len(rows), np.nan)
+        row_multipliers[active] = multipliers[codes]
+        row_discounts = np.zeros(len(rows))
+        row_discounts[active] = discounts[codes]
+
+        by_price = (row_kinds == KIND_FIXED) | (row_kinds == KIND_PRICE)
+        by_quantity = row_kinds == KIND_QUANTITY
+        # Ставка 100% без скидки: сумма переносится в ЗП как есть (пустая, текст)
+        passthrough = (row_kinds == KIND_FIXED) & (row_multipliers == 1) & (row_discounts == 0)
+        price = _to_float(prices, by_price & ~passthrough, "G", first_row)
+        quantity = _to_float(quantities, by_quantity, "B", first_row)
+
+        zp = np.full(len(rows), np.nan)
+        fixed = row_kinds == KIND_FIXED
+        zp[fixed] = (price[fixed] - price[fixed] * row_discounts[fixed]) * row_multipliers[fixed]
+        percent = row_kinds == KIND_PRICE
+        zp[percent] = row_multipliers[percent] * price[percent]
+        zp[by_quantity] = row_multipliers[by_quantity] * quantity[by_quantity]
+
+        result = [value if kind else "" for kind, value in zip(row_kinds.tolist(), zp.tolist())]
+        for row_idx in np.flatnonzero(passthrough).tolist():
+            result[row_idx] = prices[row_idx]
+
+        if items is not None:
+            for row_idx, code in zip(np.flatnonzero(active).tolist(), codes.tolist()):
+                kind = int(kinds[code])
+                value = result[row_idx]
+                items.append((
+                    first_row + row_idx,
+                    procedures[row_idx],
+                    specializations[code],
+                    quantities[row_idx],
+                    prices[row_idx],
+                    KIND_NAMES[kind],
+                    float(multipliers[code]) if kind else None,
+                    float(value) if kind and isinstance(value, (int, float)) else None,
+                ))
+
+        return result
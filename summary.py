@@ -0,0 +1,95 @@
+import re
+from datetime import date
+
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+_PERIOD_DATES = re.compile(r"(\d{1,2})\.(\d{1,2})-(\d{1,2})\.(\d{1,2})\.(\d{4})")
+
+
+def period_sort_key(period: str) -> tuple:
+    """Периоды "16.07-30.07.2025" - по дате начала, нераспознанные - в конце."""
+    match = _PERIOD_DATES.fullmatch(period)
+    if not match:
+        return 1, (), period
+    start_day, start_month, end_day, end_month, year = map(int, match.groups())
+    return 0, (year, start_month, start_day, end_month, end_day), period
+
+
+def period_bounds(period: str) -> tuple[date, date] | None:
+    """Даты начала и конца периода "16.07-30.07.2025" (период через Новый год - с прошлого года)."""
+    match = _PERIOD_DATES.fullmatch(period)
+    if not match:
+        return None
+    start_day, start_month, end_day, end_month, year = map(int, match.groups())
+    start_year = year - 1 if start_month > end_month else year
+    try:
+        return date(start_year, start_month, start_day), date(year, end_month, end_day)
+    except ValueError:
+        return None
+
+
+def total_row(summary_df: pd.DataFrame, formula_mode: str = "formula") -> list:
+    """Строка ИТОГО под ведомостью: формулы SUM по столбцам периодов.
+
+    formula_mode="values" - суммы вместо формул.
+    """
+    if formula_mode == "values":
+        return ["ИТОГО", *total_values(summary_df).values()]
+    last_row = len(summary_df) + 1  # +1 for header
+    return ["ИТОГО"] + [
+        f"=SUM({get_column_letter(col_idx)}2:{get_column_letter(col_idx)}{last_row})"
+        for col_idx in range(2, len(summary_df.columns) + 1)
+    ]
+
+
+def total_values(summary_df: pd.DataFrame) -> dict[str, int]:
+    """Значения формул строки ИТОГО по адресам ячеек."""
+    total_row_idx = len(summary_df) + 2
+    return {
+        f"{get_column_letter(col_idx)}{total_row_idx}": int(summary_df[column].sum())
+        for col_idx, column in enumerate(summary_df.columns[1:], start=2)
+    }
+
+
+class SalarySummary:
+    """Накопитель ведомости: сумма ЗП по ключу (сотрудник, период).
+
+    Заполняется по ходу расчета за O(1) на файл, DataFrame строится один раз в конце.
+    Повторный результат для того же сотрудника и периода заменяет предыдущий.
+    """
+
+    def __init__(self):
+        self.totals: dict[tuple[str, str], int] = {}
+
+    def add(self, employee: str, total_salary: float, period: str) -> None:
+        self.totals[(employee.capitalize(), period)] = round(total_salary)
+
+    @property
+    def periods(self) -> list[str]:
+        return sorted({period for _, period in self.totals}, key=period_sort_key)
+
+    def to_long_df(self) -> pd.DataFrame:
+        """Длинный формат: строка на пару (сотрудник, период)."""
+        rows = [(employee, period, total) for (employee, period), total in self.totals.items()]
+        long_df = pd.DataFrame(rows, columns=["Сотрудник", "Период", "ЗП"])
+        return long_df.sort_values(["Сотрудник", "Период"]).reset_index(drop=True)
+
+    def to_df(self) -> pd.DataFrame:
+        """Ведомость: сотрудник по строкам, период по столбцам, пропуски - 0."""
+        periods = self.periods
+        if not self.totals:
+            return pd.DataFrame(columns=["Сотрудник", *periods])
+
+        table: dict[str, dict[str, int]] = {}
+        for (employee, period), total in self.totals.items():
+            table.setdefault(employee, {})[period] = total
+
+        summary_df = pd.DataFrame(
+            [
+                {"Сотрудник": employee, **{period: totals.get(period, 0) for period in periods}}
+                for employee, totals in table.items()
+            ],
+            columns=["Сотрудник", *periods],
+        )
+        return summary_df.sort_values("Сотрудник").reset_index(drop=True)
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+import pytest
+from openpyxl import Workbook
+
+# Модули проекта лежат в корне репозитория
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import Config  # noqa: E402
+
+REPORT_HEADER = ["Услуга", "Кол-во", "C", "D", "E", "F", "Сумма", "H", "I"]
+
+
+def save_zp_file(path: Path, rows: list[tuple]) -> Path:
+    """Зарплатный файл: лист "расчет ЗП", строки (Правило, Сотрудник, Специализация, Процент в ЗП)."""
+    book = Workbook()
+    sheet = book.active
+    sheet.title = "расчет ЗП"
+    sheet.append(["Расчет"])
+    sheet.append(["Правило", "Сотрудник", "Специализация", "Процент в ЗП", "Примечание"])
+    for row in rows:
+        sheet.append(list(row))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    book.save(path)
+    return path
+
+
+def save_report(path: Path, rows: list[tuple], period: str = "01.07.2025 по 15.07.2025") -> Path:
+    """Отчет сотрудника: шапка, строка периода и строки (процедура, количество, сумма)."""
+    book = Workbook()
+    sheet = book.active
+    sheet.append(REPORT_HEADER)
+    sheet.append([f"Отчет за период с {period}"])
+    for procedure, quantity, price in rows:
+        sheet.append([procedure, quantity, "c", "d", 0.5, "f", price, "h", "i"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    book.save(path)
+    return path
+
+
+@pytest.fixture
+def config(tmp_path) -> Config:
+    """Конфиг расчета в tmp_path с зарплатным файлом на двух сотрудников."""
+    config = Config(tmp_path / "config.yaml")
+    config.info_path = save_zp_file(
+        tmp_path / "zp_file" / "Расчет ЗП.xlsx",
+        [
+            ("Правило 1", "ИВАНОВА И.\nПЕТРОВА П.", "МАНИКЮР-ПЕДИКЮР\nМАССАЖ лица", 0.4),
+            (None, None, "БРОВИ", "300 руб"),
+        ],
+    )
+    config.from_files_path = tmp_path / "files"
+    config.to_files_path = tmp_path / "files_new"
+    config.aliases_path = tmp_path / "zp_file" / "aliases.json"
+    config.from_files_path.mkdir()
+    return config
@@ -0,0 +1,33 @@
+"""Расчет по папкам: CalcZP.calculate_batch."""
+
+from openpyxl import load_workbook
+
+from calc import CalcZP
+from conftest import save_report
+
+
+def test_batch_same_period_names(config, tmp_path):
+    archive = tmp_path / "archive"
+    name = "Иванова И. отчет.xlsx"
+    save_report(archive / "2024" / "07" / name, [("МАНИКЮР", 1, 1000), ("БРОВИ", 2, 500)], "01.07.2024 по 31.07.2024")
+    save_report(archive / "2025" / "07" / name, [("МАНИКЮР", 1, 2000), ("БРОВИ", 1, 500)], "01.07.2025 по 31.07.2025")
+
+    failed = CalcZP(config).calculate_batch([archive / "2024", archive / "2025"], log_callback=lambda message: None)
+
+    assert failed == []
+    totals = {}
+    for year in ("2024", "2025"):
+        sheet = load_workbook(config.to_files_path / year / "07" / name).active
+        totals[year] = [row[-1] for row in sheet.iter_rows(values_only=True)][2:]
+    assert totals == {"2024": [400, "=SUM(G2:G3)"], "2025": [800, "=SUM(G2:G3)"]}
+    assert not (config.to_files_path / "07").exists()
+
+
+def test_batch_unique_period_names(config, tmp_path):
+    save_report(tmp_path / "archive" / "07" / "Иванова И. отчет.xlsx", [("МАНИКЮР", 1, 1000)])
+    save_report(tmp_path / "archive" / "08" / "Иванова И. отчет.xlsx", [("МАНИКЮР", 1, 1000)])
+
+    calc = CalcZP(config)
+    folders = calc.get_period_folders([tmp_path / "archive", tmp_path / "archive" / "07"])
+
+    assert calc.get_output_folders(folders) == [config.to_files_path / "07", config.to_files_path / "08"]
@@ -0,0 +1,41 @@
+"""Настройки: проверка formula_mode."""
+
+import pytest
+import yaml
+
+from config import FORMULA_MODES, Config
+
+
+def test_formula_mode_from_file(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.dump({"formula_mode": "cached"}))
+
+    assert Config(path).formula_mode == "cached"
+
+
+def test_invalid_formula_mode_in_file(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.dump({"formula_mode": "excel"}))
+
+    with pytest.raises(ValueError, match="formula_mode"):
+        Config(path)
+
+
+@pytest.mark.parametrize("mode", FORMULA_MODES)
+def test_update_formula_mode(tmp_path, mode):
+    config = Config(tmp_path / "config.yaml")
+
+    config.update_param("formula_mode", mode)
+
+    assert config.formula_mode == mode
+    assert Config(tmp_path / "config.yaml").formula_mode == mode
+
+
+def test_update_invalid_formula_mode(tmp_path):
+    config = Config(tmp_path / "config.yaml")
+
+    with pytest.raises(ValueError, match="formula_mode"):
+        config.update_param("formula_mode", "excel")
+
+    assert config.formula_mode == "formula"
+    assert not (tmp_path / "config.yaml").exists()
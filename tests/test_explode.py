@@ -0,0 +1,113 @@
+"""explode_zp_df против прежнего разворота листа "расчет ЗП" через iterrows."""
+
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from calc import explode_zp_df
+
+EMPLOYEES = ["Иванова", "Петрова А.", " Сидорова ", "Кузнецова", "Попова Б.В."]
+SPECIALIZATIONS = ["МАНИКЮР-ПЕДИКЮР", "МАССАЖ лица", " СТРИЖКИ ", "РЕСНИЦЫ, ВИЗАЖ", "БРОВИ"]
+
+
+def old_explode(df: pd.DataFrame) -> pd.DataFrame:
+    """Копия CalcZP.get_zp_df до explode_zp_df (после ffill)."""
+
+    def split_empls(empls_value: str) -> list[str]:
+        empls_value = [empls_value]
+        for key in ["\n", ",", "  "]:
+            empls_value = [x for emp in empls_value for x in emp.split(key)]
+        return empls_value
+
+    rows = []
+
+    for _, row in df.iterrows():
+        empls = split_empls(row["Сотрудник"])
+
+        for emp in empls:
+            if emp:
+                emp = emp.strip()
+                try:
+                    spec = row["Специализация"].split("\n")
+                except AttributeError:
+                    spec = [row["Специализация"]]
+                for s in spec:
+                    if not s:
+                        continue
+                    s = str(s).strip()
+                    new_row = row.copy()
+                    new_row["Специализация"] = s
+                    new_row["Сотрудник"] = emp
+                    rows.append(new_row)
+    return pd.DataFrame(rows, columns=df.columns)
+
+
+def random_cell(rng: random.Random, names: list[str], separators: list[str]) -> str:
+    pieces = rng.sample(names, rng.randint(1, 3))
+    cell = pieces[0]
+    for piece in pieces[1:]:
+        cell += rng.choice(separators) + piece
+    if rng.random() < 0.1:
+        cell += rng.choice(separators)
+    return cell
+
+
+def random_sheet(seed: int, count: int) -> pd.DataFrame:
+    """Лист как после read_excel: пропуски в Правило/Сотрудник, NaN и числа в Специализации."""
+    rng = random.Random(seed)
+    rules, employees, specializations, rates = [], [], [], []
+    for _ in range(count):
+        rules.append(rng.choice(["Процент", "Ставка"]) if rng.random() < 0.3 else np.nan)
+        employees.append(random_cell(rng, EMPLOYEES, ["\n", ",", "  ", ", ", "\n\n"]) if rng.random() < 0.4 else np.nan)
+        roll = rng.random()
+        if roll < 0.1:
+            specializations.append(np.nan)
+        elif roll < 0.15:
+            specializations.append(rng.choice([5, 12.5]))
+        else:
+            specializations.append(random_cell(rng, SPECIALIZATIONS, ["\n", "\n\n"]))
+        rates.append(rng.choice([0.4, 0.5, 750.0, "300 руб", np.nan]))
+    # Первая строка всегда заполнена: ffill ей не с чего брать значение
+    rules[0], employees[0] = "Процент", "Иванова"
+    df = pd.DataFrame({
+        "Правило": rules,
+        "Сотрудник": employees,
+        "Специализация": specializations,
+        "Процент": rates,
+    })
+    df[["Правило", "Сотрудник"]] = df[["Правило", "Сотрудник"]].ffill()
+    return df
+
+
+@pytest.mark.parametrize(
+    "seed, count",
+    [(0, 500), (1, 500), (2, 500), (3, 20_000)],
+)
+def test_explode_matches_iterrows(seed, count):
+    df = random_sheet(seed, count)
+
+    assert_frame_equal(explode_zp_df(df), old_explode(df))
+
+
+def test_explode_single_row():
+    df = pd.DataFrame({
+        "Правило": ["Процент"],
+        "Сотрудник": ["Иванова,  Петрова\nСидорова"],
+        "Специализация": ["МАССАЖ лица\n\n СТРИЖКИ "],
+        "Процент": [0.4],
+    })
+
+    result = explode_zp_df(df)
+
+    assert_frame_equal(result, old_explode(df))
+    assert list(zip(result["Сотрудник"], result["Специализация"])) == [
+        ("Иванова", "МАССАЖ лица"),
+        ("Иванова", "СТРИЖКИ"),
+        ("Петрова", "МАССАЖ лица"),
+        ("Петрова", "СТРИЖКИ"),
+        ("Сидорова", "МАССАЖ лица"),
+        ("Сидорова", "СТРИЖКИ"),
+    ]
@@ -0,0 +1,51 @@
+"""Хранилище строк расчета (LineItemStore) и его заполнение расчетом."""
+
+from calc import CalcZP
+from conftest import save_report
+from line_items import LineItemStore
+
+PERIOD = "01.07-15.07.2025"
+ITEMS = [
+    (3, "МАНИКЮР", "МАНИКЮР-ПЕДИКЮР", 1, 1000, "percent", 0.4, 400.0),
+    (4, "БРОВИ", "БРОВИ", 2, 500, "quantity", 300.0, 600.0),
+]
+
+
+def test_items_read_back(tmp_path):
+    with LineItemStore(tmp_path / "items.sqlite") as store:
+        assert store.replace([("ИВАНОВА", PERIOD, "Иванова И. отчет.xlsx", ITEMS)]) == 2
+
+    with LineItemStore(tmp_path / "items.sqlite") as store:
+        items = store.query(employee="иванова")
+        totals = store.totals(by=("employee", "period"))
+
+    assert items["procedure"].tolist() == ["МАНИКЮР", "БРОВИ"]
+    assert items["period_start"].tolist() == ["2025-07-01"] * 2
+    assert items["zp"].tolist() == [400.0, 600.0]
+    assert totals.to_dict("records") == [
+        {"employee": "Иванова", "period": PERIOD, "items": 2, "quantity": 3, "zp": 1000.0}
+    ]
+
+
+def test_rerun_replaces_rows(tmp_path):
+    with LineItemStore(tmp_path / "items.sqlite") as store:
+        store.replace([("ИВАНОВА", PERIOD, "Иванова И. отчет.xlsx", ITEMS)])
+        store.replace([("ПЕТРОВА", PERIOD, "Петрова П. отчет.xlsx", ITEMS[:1])])
+        store.replace([("ИВАНОВА", PERIOD, "Иванова И. отчет.xlsx", ITEMS[1:])])
+
+        items = store.query()
+
+    assert sorted(zip(items["employee"], items["procedure"])) == [("Иванова", "БРОВИ"), ("Петрова", "МАНИКЮР")]
+
+
+def test_calculate_twice_keeps_one_copy(config):
+    config.items_path = config.to_files_path.parent / "items.sqlite"
+    save_report(config.from_files_path / "Иванова И. отчет.xlsx", [("МАНИКЮР", 1, 1000), ("БРОВИ", 2, 500)])
+
+    for _ in range(2):
+        CalcZP(config).calculate(log_callback=lambda message: None)
+
+    with LineItemStore(config.items_path) as store:
+        items = store.query(employee="Иванова")
+    assert items["procedure"].tolist() == ["МАНИКЮР", "БРОВИ"]
+    assert items["row"].tolist() == [3, 4]
@@ -0,0 +1,89 @@
+"""Инкрементальный расчет: отпечатки файлов (CalcZP.get_fingerprint) и манифест."""
+
+import pytest
+
+from calc import CalcZP
+from conftest import save_report, save_zp_file
+from manifest import MANIFEST_NAME, Manifest
+
+ZP_ROWS = [
+    ("Правило 1", "ИВАНОВА И.", "МАНИКЮР-ПЕДИКЮР", 0.4),
+    ("Правило 2", "ПЕТРОВА П.", "МАНИКЮР-ПЕДИКЮР", 0.5),
+]
+NAMES = ["Иванова И. отчет.xlsx", "Петрова П. отчет.xlsx"]
+
+
+@pytest.fixture
+def reports(config):
+    save_zp_file(config.info_path, ZP_ROWS)
+    return [save_report(config.from_files_path / name, [("МАНИКЮР", 1, 1000)]) for name in NAMES]
+
+
+def fingerprints(config, reports) -> dict[str, dict]:
+    calc = CalcZP(config)
+    calc.zp_df = calc.get_zp_df()
+    return {fl.name: calc.get_fingerprint(fl) for fl in reports}
+
+
+def saved_manifest(config, reports) -> Manifest:
+    """Манифест после расчета: запись и файл результата на каждый отчет."""
+    config.to_files_path.mkdir()
+    manifest = Manifest(config.to_files_path / MANIFEST_NAME)
+    for name, fingerprint in fingerprints(config, reports).items():
+        manifest.update(name, fingerprint, (name.split(" ")[0].upper(), 400, "01.07-15.07.2025"), name)
+        (config.to_files_path / name).touch()
+    manifest.save()
+    return Manifest(config.to_files_path / MANIFEST_NAME)
+
+
+def skipped(config, reports, manifest: Manifest) -> dict[str, bool]:
+    """Какие файлы расчет взял бы из манифеста."""
+    return {
+        name: manifest.lookup(name, fingerprint, config.to_files_path) is not None
+        for name, fingerprint in fingerprints(config, reports).items()
+    }
+
+
+def test_unchanged_files_are_skipped(config, reports):
+    manifest = saved_manifest(config, reports)
+
+    assert skipped(config, reports, manifest) == {name: True for name in NAMES}
+    assert Manifest.result(manifest.entries[NAMES[0]]) == ("ИВАНОВА", 400, "01.07-15.07.2025")
+
+
+def test_changed_report_invalidates_only_it(config, reports):
+    manifest = saved_manifest(config, reports)
+    save_report(reports[0], [("МАНИКЮР", 2, 1000)])
+
+    assert skipped(config, reports, manifest) == {NAMES[0]: False, NAMES[1]: True}
+
+
+def test_missing_output_invalidates_file(config, reports):
+    manifest = saved_manifest(config, reports)
+    (config.to_files_path / NAMES[1]).unlink()
+
+    assert skipped(config, reports, manifest) == {NAMES[0]: True, NAMES[1]: False}
+
+
+def test_changed_salary_row_invalidates_only_that_employee(config, reports):
+    manifest = saved_manifest(config, reports)
+    save_zp_file(config.info_path, [ZP_ROWS[0], ("Правило 2", "ПЕТРОВА П.", "МАНИКЮР-ПЕДИКЮР", 0.6)])
+
+    assert skipped(config, reports, manifest) == {NAMES[0]: True, NAMES[1]: False}
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        {"salary_rules": [{"procedures": ["СТРИЖКИ"], "percent": 0.6}]},
+        {"specialization_map": {"МАНИКЮР": "МАНИКЮР-ПЕДИКЮР"}},
+        {"similarity_ratio": 0.9},
+        {"formula_mode": "values"},
+    ],
+)
+def test_rules_or_formula_mode_change_invalidates_all(config, reports, change):
+    manifest = saved_manifest(config, reports)
+    for key, value in change.items():
+        setattr(config, key, value)
+
+    assert skipped(config, reports, manifest) == {name: False for name in NAMES}
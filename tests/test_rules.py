@@ -0,0 +1,170 @@
+"""SalaryRules.compute против прежнего построчного расчета из calc_zp."""
+
+import math
+import random
+import re
+
+import pytest
+from Levenshtein import ratio
+
+from matching import ProcedureResolver
+from rules import KIND_NAMES, KIND_NONE, SPECIALIZATION_MAP, SalaryRules
+
+SIMILARITY_RATIO = 0.8
+
+PROC_TO_ZP = {
+    "МАНИКЮР-ПЕДИКЮР": 0.4,
+    "МАССАЖ лица": 750.5,
+    "КОСМЕТОЛОГИЯ": "300 руб",
+    "БРОВИ": 30,
+    "ЭПИЛЯЦИЯ": 25.5,
+    "ПИРСИНГ": "руб",
+    "МАССАЖ тела": 0.0,
+    "РЕСНИЦЫ, ВИЗАЖ": 0.35,
+}
+
+PROCEDURES = [
+    "УСЛУГИ СОТРУДНИКАМ", "ТОВАРЫ НА ПРОДАЖУ", "СТРИЖКИ", "УКЛАДКИ", "ОКРАШИВАНИЕ ВОЛОС",
+    "УХОДЫ ДЛЯ ВОЛОС", "РЕСНИЦЫ", "ВИЗАЖ", "МАНИКЮР", "ПЕДИКЮР", "МАССАЖ", "ЭПИЛЯЦИЯ", "БРОВИ",
+    "КОСМЕТОЛОГИЯ", "КОСМЕТАЛОГИЯ", "ЭПИЛЯЦИИ", "МАССАЖ тел", "НЕИЗВЕСТНО", "ПИРСИНГ", "МАССАЖ тела",
+    "", None,
+]
+QUANTITIES = [1, 2, 3, 0, None, 1.5, True]
+PRICES = [1000, 1500.5, 2300, 333.33, 0, None, "", "нет", float("nan")]
+
+
+def old_match(rows: list[tuple], proc_to_zp: dict) -> list:
+    """Копия цикла match из CalcZP.calc_zp до перехода на SalaryRules."""
+
+    def keep_only_digits(input_string: str) -> [int, None]:
+        try:
+            return int(re.sub(r"\D", "", str(input_string)))
+        except ValueError:
+            return
+
+    def get_closest_match(procedure, proc_to_zp):
+        max_ratio = SIMILARITY_RATIO
+        max_proc = None
+        for proc in proc_to_zp:
+            proc_ratio = ratio(procedure, proc)
+            if proc_ratio > max_ratio:
+                max_ratio = proc_ratio
+                max_proc = proc
+        return max_proc
+
+    def get_zp(mp, quantity, all_price):
+        zp = ""
+        if isinstance(mp, float):
+            if mp > 100:
+                zp = mp * quantity
+            else:
+                zp = mp * all_price
+        elif isinstance(mp, str):
+            if mp := keep_only_digits(mp):
+                zp = mp * quantity
+        return zp
+
+    zp_row = []
+    for row in rows:
+        procedure = row[0]
+        quantity = row[1]
+        all_price = row[6]
+        if not procedure or not quantity:
+            zp_row.append("")
+            continue
+
+        zp = ""
+
+        match procedure:
+            case "УСЛУГИ СОТРУДНИКАМ":
+                zp = all_price
+            case "ТОВАРЫ НА ПРОДАЖУ":
+                zp = all_price * 0.05
+            case "СТРИЖКИ" | "УКЛАДКИ":
+                zp = all_price * 0.5
+            case "ОКРАШИВАНИЕ ВОЛОС" | "УХОДЫ ДЛЯ ВОЛОС":
+                zp = (all_price - all_price * 0.1) * 0.5
+            case "РЕСНИЦЫ" | "ВИЗАЖ":
+                zp = all_price * 0.5
+            case _:
+                mp = proc_to_zp.get(procedure)
+                if not mp:
+                    try_procedure = SPECIALIZATION_MAP.get(procedure)
+                    if try_procedure:
+                        mp = proc_to_zp.get(try_procedure)
+                if not mp:
+                    mp = proc_to_zp.get(get_closest_match(procedure, proc_to_zp))
+                zp = get_zp(mp, quantity, all_price)
+
+        zp_row.append(zp)
+    return zp_row
+
+
+def compute(rows: list[tuple]) -> list:
+    resolver = ProcedureResolver(list(PROC_TO_ZP), SIMILARITY_RATIO, "test")
+    return SalaryRules().compute(rows, PROC_TO_ZP, resolver)
+
+
+def assert_same(expected: list, actual: list, rows: list[tuple]) -> None:
+    assert len(expected) == len(actual)
+    for row, old, new in zip(rows, expected, actual):
+        if isinstance(old, float) and math.isnan(old):
+            assert isinstance(new, float) and math.isnan(new), row
+        elif isinstance(old, (int, float)) and not isinstance(old, bool):
+            assert isinstance(new, (int, float)) and new == old, (row, old, new)
+        else:
+            assert new == old and type(new) is type(old), (row, old, new)
+
+
+def random_rows(seed: int, count: int) -> list[tuple]:
+    rng = random.Random(seed)
+    return [
+        (rng.choice(PROCEDURES), rng.choice(QUANTITIES), "c", "d", rng.random(), "f", rng.choice(PRICES))
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_compute_matches_old_loop(seed):
+    rows = []
+    for row in random_rows(seed, 2000):
+        try:
+            old_match([row], PROC_TO_ZP)
+        except TypeError:
+            # Прежний цикл падал на нечисловой сумме - новый тоже должен
+            with pytest.raises(TypeError):
+                compute([row])
+        else:
+            rows.append(row)
+
+    assert_same(old_match(rows, PROC_TO_ZP), compute(rows), rows)
+
+
+@pytest.mark.parametrize("price", [None, "", "нет", 1500, 1500.5])
+def test_passthrough_keeps_raw_sum(price):
+    rows = [("УСЛУГИ СОТРУДНИКАМ", 1, None, None, None, None, price)]
+
+    assert_same(old_match(rows, PROC_TO_ZP), compute(rows), rows)
+
+
+@pytest.mark.parametrize("procedure", ["ТОВАРЫ НА ПРОДАЖУ", "ОКРАШИВАНИЕ ВОЛОС", "МАНИКЮР"])
+@pytest.mark.parametrize("price", [None, "нет"])
+def test_non_numeric_sum_raises(procedure, price):
+    rows = [(procedure, 1, None, None, None, None, price)]
+
+    with pytest.raises(TypeError):
+        old_match(rows, PROC_TO_ZP)
+    with pytest.raises(TypeError, match="столбце G"):
+        compute(rows)
+
+
+def test_blank_rate_is_unresolved():
+    # Пустая ячейка "Процент в ЗП" после read_excel - NaN; прежний цикл давал ЗП NaN
+    proc_to_zp = {"МАНИКЮР-ПЕДИКЮР": float("nan"), "БРОВИ": 0.5}
+    rows = [("МАНИКЮР", 1, None, None, None, None, 1000), ("БРОВИ", 1, None, None, None, None, 1000)]
+    items = []
+
+    zp = SalaryRules().compute(rows, proc_to_zp, None, 2, items)
+
+    assert zp == ["", 500.0]
+    assert items[0][5] == KIND_NAMES[KIND_NONE]
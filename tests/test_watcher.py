@@ -0,0 +1,92 @@
+"""Наблюдение за папкой: файл берется в расчет, только когда он перестал меняться."""
+
+import os
+
+import pytest
+
+from conftest import save_report
+from watcher import FolderWatcher
+
+SETTLE = 5
+START = 1_700_000_000
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def write(path, rows, mtime: float):
+    save_report(path, rows)
+    os.utime(path, ns=(int(mtime * 1e9), int(mtime * 1e9)))
+
+
+@pytest.fixture
+def watcher(config):
+    return FolderWatcher(config, interval=0, settle=SETTLE, log_callback=lambda message: None, clock=Clock(START))
+
+
+def test_stable_file_processed_once(config, watcher):
+    report = config.from_files_path / "Иванова И. отчет.xlsx"
+    write(report, [("МАНИКЮР", 1, 1000)], START)
+
+    # Первый опрос: файл только появился
+    watcher.clock.now = START + 1
+    watcher.poll()
+    assert watcher.processed == 0
+    assert watcher.pending == [report.name]
+
+    # Не менялся, но settle еще не прошел
+    watcher.clock.now = START + SETTLE - 1
+    watcher.poll()
+    assert watcher.processed == 0
+
+    watcher.clock.now = START + SETTLE
+    watcher.poll()
+    assert watcher.processed == 1
+    assert watcher.pending == []
+    assert (config.to_files_path / report.name).exists()
+
+    # Дальше файл не меняется - и не пересчитывается
+    for delay in (10, 20):
+        watcher.clock.now = START + delay
+        watcher.poll()
+    assert watcher.processed == 1
+    assert watcher.state == "running"
+
+
+def test_file_being_written_waits(config, watcher):
+    report = config.from_files_path / "Иванова И. отчет.xlsx"
+    write(report, [("МАНИКЮР", 1, 1000)], START)
+    watcher.clock.now = START + 1
+    watcher.poll()
+
+    # Файл дописывается между опросами: подпись изменилась, ждем следующего опроса
+    write(report, [("МАНИКЮР", 1, 1000), ("БРОВИ", 2, 500)], START + 2)
+    watcher.clock.now = START + 30
+    watcher.poll()
+    assert watcher.processed == 0
+    assert watcher.pending == [report.name]
+
+    watcher.clock.now = START + 31
+    watcher.poll()
+    assert watcher.processed == 1
+
+    watcher.clock.now = START + 40
+    watcher.poll()
+    assert watcher.processed == 1
+
+
+def test_empty_file_waits(config, watcher):
+    report = config.from_files_path / "Иванова И. отчет.xlsx"
+    report.touch()
+    os.utime(report, ns=(START * 10**9, START * 10**9))
+
+    for delay in (1, 10, 20):
+        watcher.clock.now = START + delay
+        watcher.poll()
+    assert watcher.processed == 0
+    assert watcher.pending == [report.name]
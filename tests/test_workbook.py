@@ -0,0 +1,257 @@
+"""Книги отчетов: период из шапки, чтение .xls и запись столбца ЗП."""
+
+import datetime
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Border, Font, PatternFill, Side
+
+import workbook
+from calc import CONSOLIDATED_NAME, SUMMARY_NAME, CalcZP
+from config import FORMULA_MODES
+from conftest import save_report
+from rules import SalaryRules
+from workbook import (
+    EmployeeWorkbook,
+    read_period_dates,
+    read_xls,
+    store_formula_values,
+    stream_zp_workbook,
+    sum_numbers,
+)
+
+PERIOD = ("01.07.2025", "15.07.2025")
+
+
+@pytest.fixture
+def report(tmp_path):
+    def save(name: str):
+        book = Workbook()
+        book.active.title = "Прочее"
+        sheet = book.create_sheet("Отчет")
+        sheet.append(["Услуга", "Кол-во", "Цена"])
+        sheet.append([])
+        sheet.append([None, "Отчет за период с 01.07.2025 по 15.07.2025"])
+        sheet.append(["МАНИКЮР", 1, 1000])
+        book.active = 1
+        path = tmp_path / name
+        book.save(path)
+        return path
+
+    return save
+
+
+def test_xlsx(report):
+    assert read_period_dates(report("отчет.xlsx")) == PERIOD
+
+
+def test_xlsx_with_xls_extension(report):
+    assert read_period_dates(report("отчет.xls")) == PERIOD
+
+
+def test_without_worksheet_parser(report, monkeypatch):
+    monkeypatch.setattr(workbook, "WorkSheetParser", None)
+
+    assert read_period_dates(report("отчет.xlsx")) == PERIOD
+
+
+def test_without_reader_internals(report, monkeypatch):
+    class Reader(workbook.ExcelReader):
+        def read_manifest(self):
+            super().read_manifest()
+            del self.valid_files
+
+    monkeypatch.setattr(workbook, "ExcelReader", Reader)
+
+    assert read_period_dates(report("отчет.xls")) == PERIOD
+
+
+@pytest.mark.parametrize("error", [TypeError, KeyError])
+def test_worksheet_parser_errors(report, monkeypatch, error):
+    class Parser:
+        def __init__(self, *args, **kwargs):
+            raise error("parse")
+
+    monkeypatch.setattr(workbook, "WorkSheetParser", Parser)
+
+    assert read_period_dates(report("отчет.xlsx")) == PERIOD
+
+
+def test_read_xls_formats(tmp_path):
+    xlwt = pytest.importorskip("xlwt")
+    xls_book = xlwt.Workbook()
+    xls_sheet = xls_book.add_sheet("Отчет")
+    xls_sheet.write(0, 0, "Услуга", xlwt.easyxf("font: bold on"))
+    xls_sheet.write(0, 1, "Кол-во", xlwt.easyxf("font: italic on"))
+    xls_sheet.write(1, 0, 1234.5, xlwt.easyxf(num_format_str="#,##0.00"))
+    xls_sheet.write(1, 1, datetime.date(2025, 7, 1), xlwt.easyxf(num_format_str="DD.MM.YYYY"))
+    xls_sheet.write(1, 2, 5)
+    xls_sheet.write(2, 0, "Итого", xlwt.easyxf(
+        "pattern: pattern solid, fore_colour yellow; borders: left thin, bottom medium; "
+        "align: horiz center, vert center, wrap on"
+    ))
+    xls_sheet.col(0).width = 40 * 256
+    xls_sheet.row(2).height_mismatch = True
+    xls_sheet.row(2).height = 600
+    path = tmp_path / "отчет.xls"
+    xls_book.save(str(path))
+
+    sheet = read_xls(path).active
+
+    assert sheet["A1"].font.b and not sheet["A1"].font.i
+    assert sheet["B1"].font.i and not sheet["B1"].font.b
+    assert sheet["A2"].number_format == "#,##0.00"
+    assert sheet["B2"].value == datetime.datetime(2025, 7, 1)
+    assert sheet["B2"].number_format == "DD.MM.YYYY"
+    assert sheet["C2"].number_format == "General"
+    assert sheet["C2"].fill.fill_type is None and sheet["C2"].border.left.style is None
+    assert sheet["A3"].fill.fill_type == "solid"
+    assert sheet["A3"].fill.fgColor.rgb == "00FFFF00"
+    assert sheet["A3"].border.left.style == "thin"
+    assert sheet["A3"].border.bottom.style == "medium"
+    assert sheet["A3"].alignment.horizontal == "center"
+    assert sheet["A3"].alignment.vertical == "center"
+    assert sheet["A3"].alignment.wrap_text
+    assert sheet.column_dimensions["A"].width == 40
+    assert sheet.row_dimensions[3].height == 30
+
+
+def styled_report(path):
+    """Отчет с оформлением, пустыми строками в середине и в конце и вторым листом."""
+    book = Workbook()
+    sheet = book.active
+    sheet.title = "Отчет"
+    sheet.append(["Услуга", "Кол-во", "Цена", "Скидка", "Код", "Кабинет", "Сумма", "Оплата", "Клиент"])
+    sheet.append(["Отчет за период с 01.07.2025 по 15.07.2025"])
+    procedures = ["МАНИКЮР", "БРОВИ", "СТРИЖКИ", "НЕИЗВЕСТНО"]
+    for idx in range(40):
+        if idx % 7 == 3:
+            sheet.append([])
+            continue
+        sheet.append([procedures[idx % 4], idx % 3, 1000.5, 0, 123, "1", 100 * idx, "нал", "X"])
+    for cell in sheet[1]:
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill("solid", fgColor="FFFF00")
+    for row in range(3, 43):
+        sheet.cell(row=row, column=3).number_format = "#,##0.00"
+        sheet.cell(row=row, column=9).border = Border(left=Side(style="thin"))
+    # Оформленные пустые строки после данных
+    for row in range(43, 48):
+        sheet.cell(row=row, column=2).font = Font(italic=True)
+    sheet.merge_cells("A2:D2")
+    sheet.column_dimensions["A"].width = 40
+    book.create_sheet("Второй").append([1, 2, "x"])
+    book.save(path)
+    return path
+
+
+def compute_zp(rows, first_row=2):
+    return SalaryRules().compute(rows, {"МАНИКЮР-ПЕДИКЮР": 0.4, "БРОВИ": "300 руб"}, None, first_row)
+
+
+def assert_same_cells(expected, actual):
+    assert expected.max_row == actual.max_row and expected.max_column == actual.max_column
+    for expected_row, actual_row in zip(expected.iter_rows(), actual.iter_rows()):
+        for expected_cell, actual_cell in zip(expected_row, actual_row):
+            for attr in ("value", "number_format", "font", "fill", "border"):
+                assert repr(getattr(actual_cell, attr)) == repr(getattr(expected_cell, attr)), (
+                    expected_cell.coordinate,
+                    attr,
+                )
+
+
+@pytest.mark.parametrize("formula_mode", FORMULA_MODES)
+@pytest.mark.parametrize("chunk_rows", [3, 5000])
+def test_stream_matches_add_zp_column(tmp_path, formula_mode, chunk_rows):
+    source = styled_report(tmp_path / "отчет.xlsx")
+    employee_workbook = EmployeeWorkbook.load(source)
+    employee_workbook.add_zp_column(compute_zp(employee_workbook.rows), formula_mode)
+    employee_workbook.save(tmp_path / "full.xlsx")
+
+    period, _, rows = stream_zp_workbook(source, tmp_path / "stream.xlsx", compute_zp, chunk_rows, formula_mode)
+
+    assert period == employee_workbook.period
+    assert rows == len(employee_workbook.rows)
+    expected = load_workbook(tmp_path / "full.xlsx")
+    actual = load_workbook(tmp_path / "stream.xlsx")
+    assert actual.sheetnames == expected.sheetnames
+    assert actual.active.title == expected.active.title
+    for expected_sheet, actual_sheet in zip(expected.worksheets, actual.worksheets):
+        assert_same_cells(expected_sheet, actual_sheet)
+        assert sorted(map(str, actual_sheet.merged_cells.ranges)) == sorted(map(str, expected_sheet.merged_cells.ranges))
+
+    # SUM - на месте ЗП последней строки данных: 9 столбцов + ЗП без E, G, H - столбец G
+    sum_cell = actual.active.cell(row=rows + 1, column=7)
+    zp_values = [actual.active.cell(row=row, column=7).value for row in range(2, rows + 1)]
+    if formula_mode == "values":
+        assert sum_cell.value == pytest.approx(sum_numbers(zp_values))
+    else:
+        assert sum_cell.value == f"=SUM(G2:G{rows})"
+
+
+def sheet_values(sheet) -> list[tuple]:
+    return list(sheet.iter_rows(values_only=True))
+
+
+def test_consolidated_matches_per_file_output(config, tmp_path):
+    save_report(config.from_files_path / "Иванова И. отчет.xlsx", [("МАНИКЮР", 1, 1000), ("БРОВИ", 2, 500)])
+    # Тот же сотрудник и период - второй лист с номером
+    save_report(config.from_files_path / "Иванова И. отчет 2.xlsx", [("МАНИКЮР", 3, 2000), ("БРОВИ", 1, 500)])
+    save_report(
+        config.from_files_path / "Петрова П. отчет.xlsx",
+        [("МАНИКЮР", 1, 1500), ("НЕИЗВЕСТНО", 1, 100)],
+        "16.07.2025 по 31.07.2025",
+    )
+    CalcZP(config).calculate(log_callback=lambda message: None)
+    per_file = {
+        path.name: sheet_values(load_workbook(path).active)
+        for path in config.to_files_path.iterdir()
+        if path.name != SUMMARY_NAME
+    }
+    assert len(per_file) == 3
+
+    config.to_files_path = tmp_path / "consolidated"
+    config.consolidated_output = True
+    CalcZP(config).calculate(log_callback=lambda message: None)
+
+    book = load_workbook(config.to_files_path / CONSOLIDATED_NAME)
+    assert sorted(path.name for path in config.to_files_path.iterdir()) == [CONSOLIDATED_NAME]
+    assert book.sheetnames[0] == "Ведомость"
+    employee_sheets = book.sheetnames[1:]
+    assert sorted(employee_sheets) == [
+        "Иванова 01.07-15.07.2025",
+        "Иванова 01.07-15.07.2025 (2)",
+        "Петрова 16.07-31.07.2025",
+    ]
+    assert len({title.lower() for title in book.sheetnames}) == len(book.sheetnames)
+    # Листы сотрудников - те же ячейки, что и отдельные файлы
+    assert sorted(map(repr, (sheet_values(book[title]) for title in employee_sheets))) == sorted(
+        map(repr, per_file.values())
+    )
+
+
+@pytest.mark.parametrize("chunk", [64, 1 << 20])
+def test_store_formula_values(tmp_path, monkeypatch, chunk):
+    # Маленький кусок - ячейки с формулами разрезаются границами кусков
+    monkeypatch.setattr(workbook, "_LAYOUT_CHUNK", chunk)
+    book = Workbook()
+    sheet = book.active
+    for row in range(1, 21):
+        sheet.append([f"Строка {row}", row * 10, 1.5])
+    sheet["B21"] = "=SUM(B1:B20)"
+    sheet["C21"] = "=SUM(C1:C20)"
+    book.create_sheet("Второй")["A1"] = "=1+1"
+    path = tmp_path / "формулы.xlsx"
+    book.save(path)
+
+    store_formula_values(path, {1: {"B21": 2100, "C21": 30.0}, 2: {"A1": 2}})
+
+    values = load_workbook(path, data_only=True)
+    assert values.active["B21"].value == 2100
+    assert values.active["C21"].value == 30
+    assert values["Второй"]["A1"].value == 2
+    assert values.active["B20"].value == 200
+    # Формулы остаются формулами
+    formulas = load_workbook(path)
+    assert formulas.active["B21"].value == "=SUM(B1:B20)"
+    assert formulas["Второй"]["A1"].value == "=1+1"
@@ -0,0 +1,11 @@
+import hashlib
+from pathlib import Path
+
+
+def file_digest(file_path: Path) -> str:
+    """SHA-256 содержимого файла."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,255 @@
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from calc import SUMMARY_NAME, CalcZP
+from config import Config
+from manifest import MANIFEST_NAME, Manifest
+from profiling import Profiler
+from summary import SalarySummary
+
+STATUS_NAME = "watch_status.json"
+
+
+def file_signature(path: Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FolderWatcher:
+    """Следит за папкой с отчетами и досчитывает новые и измененные файлы.
+
+    Зарплатный файл, индекс сотрудников и кэш процедур держатся в памяти и
+    перечитываются, только если изменился сам зарплатный файл. Файл берется в
+    расчет, когда он не менялся settle секунд (его еще может дописывать
+    Excel или копирование). Ведомость собирается из манифеста, без пересчета
+    остальных файлов. Состояние пишется в JSON-файл статуса.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        interval: float | None = None,
+        settle: float | None = None,
+        status_path: Path | None = None,
+        log_callback=None,
+        event_callback=None,
+        clock=time.time,
+    ):
+        self.config = config
+        self.interval = interval if interval is not None else config.watch_interval
+        self.settle = settle if settle is not None else config.watch_settle
+        self.status_path = status_path or config.to_files_path / STATUS_NAME
+        self.log_callback = log_callback
+        self.event_callback = event_callback
+        # Текущее время для проверки settle (в тестах - поддельные часы)
+        self.clock = clock
+
+        self.calc = CalcZP(config)
+        # Наблюдатель не проходит через CalcZP.start_calculation
+        config.to_files_path.mkdir(parents=True, exist_ok=True)
+        self.manifest = Manifest(config.to_files_path / MANIFEST_NAME)
+        self.stop_event = threading.Event()
+
+        self.zp_signature = None
+        # имя файла -> подпись (mtime, размер), с которой он уже обработан
+        self.known: dict[str, tuple[int, int]] = {}
+        # подписи с прошлого опроса: файл готов, если подпись не изменилась
+        self.seen: dict[str, tuple[int, int]] = {}
+        self.pending: list[str] = []
+        self.failed_files: dict[str, str] = {}
+
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.state = "starting"
+        self.error = None
+        self.processed = 0
+        self.last_batch = None
+
+    def log(self, message: str) -> None:
+        print(message)
+        if self.log_callback:
+            self.log_callback(message)
+
+    def stop(self, *_) -> None:
+        """Останавливает наблюдение после текущей пачки файлов."""
+        self.stop_event.set()
+
+    def install_signal_handlers(self) -> None:
+        if threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+    def run(self) -> None:
+        """Опрашивает папку до SIGINT/SIGTERM или stop()."""
+        self.install_signal_handlers()
+        self.log(f"Наблюдение за папкой {self.config.from_files_path} (опрос {self.interval} с)")
+        self.write_status()
+        try:
+            while not self.stop_event.is_set():
+                self.poll()
+                self.stop_event.wait(self.interval)
+        finally:
+            if self.calc.resolver is not None:
+                self.calc.resolver.save()
+            self.state = "stopped"
+            self.write_status()
+            self.log("Наблюдение остановлено")
+
+    def poll(self) -> None:
+        """Один опрос: перечитать зарплатный файл, если он изменился, и досчитать готовые файлы."""
+        try:
+            zp_signature = file_signature(self.config.info_path)
+            if zp_signature != self.zp_signature:
+                self.load_zp(zp_signature)
+
+            ready, removed = self.scan()
+            if ready or removed:
+                self.process(ready)
+            self.state = "running"
+            self.error = None
+        except Exception as e:
+            self.state = "error"
+            self.error = str(e)
+            self.log(f"ОШИБКА: {e}")
+        self.write_status()
+
+    def load_zp(self, zp_signature: tuple[int, int] | None) -> None:
+        self.calc.zp_df = self.calc.get_zp_df(self.log_callback)
+        if self.calc.resolver is not None:
+            self.calc.resolver.save()
+        self.calc.resolver = self.calc.get_resolver(self.calc.zp_df)
+        self.zp_signature = zp_signature
+        # Все файлы заново сверяются с манифестом: пересчитаются только сотрудники,
+        # чьи строки в зарплатном файле изменились
+        self.known = {}
+
+    def scan(self) -> tuple[list[Path], set[str]]:
+        """Файлы, готовые к расчету, и имена удаленных файлов."""
+        now = self.clock()
+        files = {
+            fl.name: fl
+            for fl in self.calc.get_files_df()
+            # Временные файлы Excel ("~$отчет.xlsx") не считаем
+            if not fl.name.startswith("~$")
+        }
+
+        ready = []
+        pending = []
+        seen = {}
+        for name, fl in sorted(files.items()):
+            signature = file_signature(fl)
+            if signature is None:
+                continue
+            seen[name] = signature
+            if self.known.get(name) == signature:
+                continue
+            mtime_age = now - signature[0] / 1e9
+            if self.seen.get(name) == signature and mtime_age >= self.settle and signature[1] > 0:
+                ready.append(fl)
+            else:
+                pending.append(name)
+
+        removed = set(self.known) - set(files)
+        for name in removed:
+            self.known.pop(name)
+        self.seen = seen
+        self.pending = pending
+        return ready, removed
+
+    def process(self, files: list[Path]) -> None:
+        """Досчитывает файлы пачкой и обновляет манифест и ведомость."""
+        calc = self.calc
+        calc.profiler = Profiler(self.event_callback)
+        calc.progress_total = len(files) * 4 + 1
+        signatures = {fl.name: file_signature(fl) for fl in files}
+
+        fingerprints = {}
+        to_process = []
+        failed_files = []
+        for fl in files:
+            try:
+                fingerprints[fl.name] = calc.get_fingerprint(fl)
+            except OSError as e:
+                failed_files.append((fl.name, str(e)))
+                continue
+            entry = self.manifest.lookup(fl.name, fingerprints[fl.name], self.config.to_files_path)
+            if entry is None:
+                to_process.append(fl)
+
+        if to_process:
+            self.log(f"Новые и измененные файлы: {len(to_process)}")
+            results = calc.run_files(to_process, failed_files, log_callback=self.log_callback)
+            failed = {name for name, _ in failed_files}
+            for fl, result in zip(to_process, results):
+                if fl.name in failed:
+                    self.manifest.remove(fl.name)
+                else:
+                    self.manifest.update(fl.name, fingerprints[fl.name], result, calc.get_export_name(fl))
+
+        for fl in files:
+            # Упавший файл повторяем, только когда он снова изменится
+            self.known[fl.name] = signatures[fl.name]
+            self.failed_files.pop(fl.name, None)
+        self.failed_files.update(dict(failed_files))
+
+        self.manifest.retain(set(self.known) | set(self.seen))
+        self.manifest.save()
+        calc.resolver.save()
+        calc.save_line_items(self.log_callback)
+        self.save_summary()
+
+        self.processed += len(to_process)
+        self.last_batch = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "files": [fl.name for fl in to_process],
+            "failed": [name for name, _ in failed_files],
+        }
+        self.log(f"Ведомость обновлена: пересчитано {len(to_process)}, ошибок {len(failed_files)}")
+
+    def save_summary(self) -> None:
+        """Ведомость по результатам из манифеста: меняются только строки пересчитанных файлов."""
+        summary = SalarySummary()
+        for name in sorted(self.manifest.entries):
+            result = Manifest.result(self.manifest.entries[name])
+            if result is not None:
+                summary.add(*result)
+
+        calc = self.calc
+        calc.summary = summary
+        calc.summary_df = summary.to_df()
+        calc.summary_long_df = summary.to_long_df()
+
+        # Пишем во временный файл и подменяем, чтобы ведомость не была видна недописанной
+        summary_path = self.config.to_files_path / SUMMARY_NAME
+        tmp_path = summary_path.with_name(f"~tmp {summary_path.name}")
+        calc.save_summary(tmp_path)
+        os.replace(tmp_path, summary_path)
+
+    def write_status(self) -> None:
+        status = {
+            "state": self.state,
+            "pid": os.getpid(),
+            "started": self.started,
+            "updated": datetime.now().isoformat(timespec="seconds"),
+            "files_path": str(self.config.from_files_path),
+            "to_files_path": str(self.config.to_files_path),
+            "files": len(self.manifest.entries),
+            "processed": self.processed,
+            "pending": self.pending,
+            "failed_files": self.failed_files,
+            "last_batch": self.last_batch,
+            "error": self.error,
+        }
+        self.status_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.status_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(status, file, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.status_path)
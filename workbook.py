@@ -0,0 +1,912 @@
+import os
+import re
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import cached_property
+from pathlib import Path
+
+from openpyxl import Workbook
+from openpyxl.cell import Cell, WriteOnlyCell
+from openpyxl.compat import safe_string
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.reader.excel import ExcelReader, load_workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+from openpyxl.worksheet.dimensions import ColumnDimension, RowDimension
+
+try:
+    # Внутренний модуль openpyxl (проверено на 3.1.5); без него шапка читается через load_workbook
+    from openpyxl.worksheet._reader import WorkSheetParser
+except ImportError:
+    WorkSheetParser = None
+
+# Начало zip-архива: .xlsx, даже если у файла расширение .xls
+XLSX_SIGNATURE = b"PK\x03\x04"
+# Pattern: "за период с 16.07.2025 по 30.07.2025"
+PERIOD_PATTERN = re.compile(r"с\s+(\d{1,2}\.\d{1,2}\.\d{4})\s+по\s+(\d{1,2}\.\d{1,2}\.\d{4})")
+# Сколько строк данных после заголовка просматривать в поисках периода
+PERIOD_ROWS = 5
+# Столбцы, которые удаляются из книги сотрудника (E, G, H)
+DELETED_COLUMNS = (5, 7, 8)
+
+# Теги разметки листа в XML: строки, столбцы и объединения (ячейки не разбираются)
+_LAYOUT_TAG = re.compile(rb"<(?:\w+:)?(row|col|mergeCell)\s([^>]*)>")
+_XML_ATTR = re.compile(rb"""([\w:]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_LAYOUT_CHUNK = 1 << 20
+# Атрибуты строк и столбцов, которые переносятся в новую книгу (без ссылок на стили)
+_ROW_ATTRS = {"ht", "customHeight", "hidden", "outlineLevel", "collapsed", "thickTop", "thickBot"}
+_COLUMN_ATTRS = {"min", "max", "width", "customWidth", "bestFit", "hidden", "outlineLevel", "collapsed"}
+# Тег формулы ячейки (<f>...</f>, <f t="shared" .../>)
+_FORMULA_TAG = re.compile(rb"<(?:\w+:)?f[\s>/]")
+# Сколько строк книги сотрудника держать в памяти при потоковой обработке
+STREAM_CHUNK_ROWS = 5000
+# Лист ведомости в общей книге результатов
+SUMMARY_SHEET_TITLE = "Ведомость"
+SHEET_TITLE_LENGTH = 31
+_INVALID_TITLE_CHARS = re.compile(r"[\\*?:/\[\]]")
+# Оформление ячеек .xls (коды xlrd) -> названия openpyxl; заливка с кода 1, границы и выравнивание с 0
+_XLS_FILL_PATTERNS = (
+    "solid", "mediumGray", "darkGray", "lightGray", "darkHorizontal", "darkVertical", "darkDown",
+    "darkUp", "darkGrid", "darkTrellis", "lightHorizontal", "lightVertical", "lightDown", "lightUp",
+    "lightGrid", "lightTrellis", "gray125", "gray0625",
+)
+_XLS_BORDER_STYLES = (
+    None, "thin", "medium", "dashed", "dotted", "thick", "double", "hair", "mediumDashed",
+    "dashDot", "mediumDashDot", "dashDotDot", "mediumDashDotDot", "slantDashDot",
+)
+_XLS_HORIZONTAL = {1: "left", 2: "center", 3: "right", 4: "fill", 5: "justify", 6: "centerContinuous", 7: "distributed"}
+_XLS_VERTICAL = {0: "top", 1: "center", 3: "justify", 4: "distributed"}
+# Заголовок ведомости - как его пишет pandas.to_excel
+_HEADER_FONT = Font(bold=True)
+_HEADER_BORDER = Border(
+    left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"), bottom=Side(style="thin")
+)
+_HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+# Ячейка с формулой без значения, как ее пишет openpyxl: <c r="J10" s="3"><f>SUM(J2:J9)</f><v /></c>
+_EMPTY_FORMULA_CELL = re.compile(rb'(<c r="([A-Z]+\d+)"[^>]*>\s*<f>[^<]*</f>\s*)<v\s*/>')
+
+
+def format_period(start_date: str, end_date: str) -> str:
+    """Format as "16.07-30.07.2025" (same year always)."""
+    start_parts = start_date.split(".")
+    end_parts = end_date.split(".")
+    return f"{start_parts[0]}.{start_parts[1]}-{end_parts[0]}.{end_parts[1]}.{end_parts[2]}"
+
+
+def find_period_dates(rows: list[tuple]) -> tuple[str, str] | None:
+    """Даты начала и конца периода ("16.07.2025", "30.07.2025") в первых строках данных."""
+    for row in rows[:PERIOD_ROWS]:
+        for value in row:
+            if not isinstance(value, str):
+                continue
+            match = PERIOD_PATTERN.search(value)
+            if match:
+                return match.group(1), match.group(2)
+    return None
+
+
+def find_period(rows: list[tuple]) -> str:
+    """Ищет строку периода в первых строках данных."""
+    dates = find_period_dates(rows)
+    return format_period(*dates) if dates else "Период не найден"
+
+
+def read_period_dates(file_path: Path) -> tuple[str, str] | None:
+    """Даты периода из шапки отчета без чтения всего листа.
+
+    Читаются только строки данных, в которых ищется период (как у
+    EmployeeWorkbook.period). У .xlsx разбирается XML только активного листа
+    и только до этих строк: load_workbook(read_only=True) без размеров листа
+    в файле прочитал бы каждый лист целиком, да еще и стили. .xls - через
+    xlrd без стилей и только активный лист; .xls, который на деле .xlsx,
+    читается как .xlsx (как в load_xls).
+    """
+    if file_path.suffix.lower() == ".xls" and not is_xlsx_file(file_path):
+        return find_period_dates(_xls_header_rows(file_path))
+    # Файл передается открытым: ExcelReader по пути не принимает расширение .xls
+    with open(file_path, "rb") as source:
+        if WorkSheetParser is not None:
+            try:
+                return find_period_dates(_xlsx_header_rows(source))
+            except Exception as e:
+                # Внутренности openpyxl другой версии (или нестандартный файл) - общий путь
+                print(f"Шапка {file_path.name} читается через load_workbook: {e}")
+                source.seek(0)
+        return find_period_dates(_load_header_rows(source))
+
+
+def is_xlsx_file(file_path: Path) -> bool:
+    with open(file_path, "rb") as file:
+        return file.read(len(XLSX_SIGNATURE)) == XLSX_SIGNATURE
+
+
+def _xlsx_header_rows(source) -> list[tuple]:
+    reader = ExcelReader(source, read_only=True, data_only=True)
+    try:
+        reader.read_manifest()
+        reader.read_strings()
+        reader.read_workbook()
+        # Листы по порядку, как их собирает load_workbook; активный - по номеру из книги
+        paths = [rel.target for _, rel in reader.parser.find_sheets() if rel.target in reader.valid_files]
+        if not paths:
+            return []
+        index = reader.wb._active_sheet_index
+        rows = []
+        with reader.archive.open(paths[index if index < len(paths) else 0]) as source:
+            for row_idx, cells in WorkSheetParser(source, reader.shared_strings, data_only=True).parse():
+                if row_idx > PERIOD_ROWS + 1:
+                    break
+                if row_idx > 1:
+                    rows.append(tuple(cell["value"] for cell in cells))
+        return rows
+    finally:
+        reader.archive.close()
+
+
+def _load_header_rows(source) -> list[tuple]:
+    book = load_workbook(source, read_only=True, data_only=True)
+    try:
+        return list(book.active.iter_rows(min_row=2, max_row=PERIOD_ROWS + 1, values_only=True))
+    finally:
+        book.close()
+
+
+def _xls_header_rows(file_path: Path) -> list[list]:
+    import xlrd
+
+    xls_book = xlrd.open_workbook(str(file_path), on_demand=True)
+    try:
+        # Активный лист - первый выбранный (как в read_xls); листы грузятся по одному
+        sheet = None
+        for index in range(xls_book.nsheets):
+            sheet = xls_book.sheet_by_index(index)
+            if sheet.sheet_selected:
+                break
+            xls_book.unload_sheet(index)
+        else:
+            sheet = xls_book.sheet_by_index(0)
+        return [sheet.row_values(row_idx) for row_idx in range(1, min(sheet.nrows, PERIOD_ROWS + 1))]
+    finally:
+        xls_book.release_resources()
+
+
+def read_sheet_layout(sheet) -> tuple[dict[str, dict], dict[int, dict], list[str]]:
+    """Ширина столбцов, высота строк и объединенные ячейки листа.
+
+    У листа read_only их нет, для него разбирается XML листа (без ячеек).
+    """
+    if not isinstance(sheet, ReadOnlyWorksheet):
+        columns = {
+            letter: {key: value for key, value in dim if key in _COLUMN_ATTRS}
+            for letter, dim in sheet.column_dimensions.items()
+        }
+        rows = {
+            idx: attrs
+            for idx, dim in sheet.row_dimensions.items()
+            if (attrs := {key: value for key, value in dim if key in _ROW_ATTRS})
+        }
+        return columns, rows, [str(cell_range) for cell_range in sheet.merged_cells.ranges]
+
+    columns, rows, merged = {}, {}, []
+    tail = b""
+    with sheet._get_source() as source:
+        while chunk := source.read(_LAYOUT_CHUNK):
+            data = tail + chunk
+            # Незаконченный тег переносим в следующий кусок
+            end = data.rfind(b"<")
+            data, tail = data[:end], data[end:]
+            for match in _LAYOUT_TAG.finditer(data):
+                tag = match.group(1)
+                attrs = {
+                    key.decode(): (double if double is not None else single).decode()
+                    for key, double, single in _XML_ATTR.findall(match.group(2))
+                }
+                if tag == b"row":
+                    row_attrs = {key: value for key, value in attrs.items() if key in _ROW_ATTRS}
+                    if row_attrs and "r" in attrs:
+                        rows[int(attrs["r"])] = row_attrs
+                elif tag == b"col":
+                    col_attrs = {key: value for key, value in attrs.items() if key in _COLUMN_ATTRS}
+                    columns[get_column_letter(int(col_attrs["min"]))] = col_attrs
+                else:
+                    merged.append(attrs["ref"])
+    return columns, rows, merged
+
+
+def sheet_has_formulas(sheet) -> bool:
+    """Есть ли на листе read_only формулы (по XML листа, без разбора ячеек)."""
+    tail = b""
+    with sheet._get_source() as source:
+        while chunk := source.read(_LAYOUT_CHUNK):
+            data = tail + chunk
+            if _FORMULA_TAG.search(data):
+                return True
+            tail = data[-8:]
+    return False
+
+
+def store_formula_values(file_path: Path, values: dict[int, dict[str, float]]) -> None:
+    """Дописывает в сохраненную книгу значения формул (openpyxl пишет формулы без них).
+
+    values - {номер листа (с 1): {адрес ячейки: значение}}. Так книгу с
+    формулами можно читать pandas/openpyxl (data_only) без пересчета в Excel.
+    Листы переписываются кусками, остальные части архива копируются как есть.
+    """
+    sheets = {f"xl/worksheets/sheet{idx}.xml": cells for idx, cells in values.items() if cells}
+    if not sheets:
+        return
+    tmp_path = file_path.with_name(f"~tmp {file_path.name}")
+    with zipfile.ZipFile(file_path) as source, zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as target:
+        for info in source.infolist():
+            cells = sheets.get(info.filename)
+            if cells is None:
+                target.writestr(info, source.read(info))
+                continue
+
+            def fill(match: re.Match) -> bytes:
+                value = cells.get(match.group(2).decode())
+                return match.group(0) if value is None else match.group(1) + f"<v>{safe_string(value)}</v>".encode()
+
+            tail = b""
+            with source.open(info) as sheet, target.open(info, "w") as output:
+                while chunk := sheet.read(_LAYOUT_CHUNK):
+                    data = tail + chunk
+                    # Незаконченную ячейку переносим в следующий кусок
+                    end = data.rfind(b"<c ")
+                    if end <= 0:
+                        end = len(data)
+                    data, tail = data[:end], data[end:]
+                    output.write(_EMPTY_FORMULA_CELL.sub(fill, data))
+                output.write(_EMPTY_FORMULA_CELL.sub(fill, tail))
+    os.replace(tmp_path, file_path)
+
+
+def sum_numbers(values) -> float:
+    """Значение формулы SUM по ячейкам: текст и пустые ячейки не считаются."""
+    return sum(value for value in values if isinstance(value, (int, float)))
+
+
+def _style_key(cell) -> tuple | None:
+    if not getattr(cell, "has_style", False):
+        return None
+    return tuple(cell.style_array if hasattr(cell, "style_array") else cell._style)
+
+
+class _StyleCopier:
+    """Переносит стили ячеек в другую книгу; каждый различный стиль - один раз."""
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self._styles = {}
+
+    def __call__(self, cell, value=None) -> Cell:
+        style = cell.style_array if hasattr(cell, "style_array") else cell._style
+        key = tuple(style)
+        template = self._styles.get(key)
+        if template is None:
+            template = Cell(self.sheet, row=1, column=1)
+            template.font = cell.font
+            template.fill = cell.fill
+            template.border = cell.border
+            template.alignment = cell.alignment
+            template.protection = cell.protection
+            template.number_format = cell.number_format
+            self._styles[key] = template
+        return Cell(self.sheet, row=1, column=1, value=value, style_array=template._style)
+
+
+def _copy_layout(source, target) -> list[str]:
+    """Переносит ширину столбцов и высоту строк; возвращает объединения для записи в конце."""
+    columns, rows, merged = read_sheet_layout(source)
+    for letter, attrs in columns.items():
+        target.column_dimensions[letter] = ColumnDimension(target, index=letter, **attrs)
+    for idx, attrs in rows.items():
+        target.row_dimensions[idx] = RowDimension(target, index=idx, **attrs)
+    return merged
+
+
+def _row_values(copy_style: _StyleCopier, cells: tuple) -> list:
+    return [
+        # у пустых ячеек листа read_only (EmptyCell) нет стиля
+        copy_style(cell, cell.value) if getattr(cell, "has_style", False) else cell.value
+        for cell in cells
+    ]
+
+
+def copy_sheet_streaming(source, target) -> None:
+    """Переписывает лист source в лист write-only книги target построчно.
+
+    Переносятся значения, стили ячеек, ширина столбцов, высота строк и
+    объединения.
+    """
+    merged = _copy_layout(source, target)
+    copy_style = _StyleCopier(target)
+    for row in source.iter_rows():
+        target.append(_row_values(copy_style, row))
+    for cell_range in merged:
+        target.merged_cells.add(cell_range)
+
+
+def _open_zp_source(file_path: Path) -> tuple[Workbook, Workbook | None]:
+    """Книга сотрудника для построчного чтения и, если на листе есть формулы,
+    она же со значениями формул (data_only). Обе закрывает вызывающий.
+    """
+    if file_path.suffix.lower() == ".xls":
+        # .xls читается целиком (xlrd), но и строк в нем не больше 65536
+        return load_xls(file_path), None
+    book = load_workbook(file_path, read_only=True)
+    sheet = book.active
+    if sheet.max_column is None:
+        # В файле нет размеров листа - считаем их по ячейкам
+        sheet.calculate_dimension(force=True)
+    if sheet_has_formulas(sheet):
+        # Для формул нужны сохраненные значения - читаем их параллельно
+        return book, load_workbook(file_path, read_only=True, data_only=True)
+    return book, None
+
+
+def write_zp_sheet(
+    sheet, target, compute, chunk_rows: int = STREAM_CHUNK_ROWS, values_sheet=None, formula_mode: str = "formula"
+) -> tuple[str, float, int, dict[str, float]]:
+    """Переписывает лист сотрудника в лист write-only книги со столбцом ЗП.
+
+    ЗП считается кусками по chunk_rows строк через compute(rows, first_row)
+    и сразу пишется, так что в памяти не бывает больше одного куска.
+    values_sheet - тот же лист со значениями формул. Возвращает (период,
+    сумма ЗП, строк данных, значения формул для store_formula_values).
+    """
+    merged = _copy_layout(sheet, target)
+    zp_stream = _ZpColumnStream(target, sheet.max_column or 0, compute, formula_mode, chunk_rows)
+    values_rows = values_sheet.iter_rows(values_only=True) if values_sheet is not None else None
+    for row_idx, cells in enumerate(sheet.iter_rows(), start=1):
+        values = next(values_rows) if values_rows else None
+        if row_idx == 1:
+            zp_stream.write_header(cells)
+        else:
+            zp_stream.add(cells, values)
+    zp_stream.finish()
+    for cell_range in merged:
+        target.merged_cells.add(cell_range)
+    return find_period(zp_stream.period_rows), zp_stream.total, zp_stream.data_rows, zp_stream.formula_values
+
+
+def stream_zp_workbook(
+    file_path: Path, export_path: Path, compute, chunk_rows: int = STREAM_CHUNK_ROWS, formula_mode: str = "formula"
+) -> tuple[str, float, int]:
+    """Книга сотрудника со столбцом ЗП при ограниченной памяти.
+
+    Лист читается построчно (read_only) и пишется в write-only книгу через
+    write_zp_sheet. Результат совпадает по ячейкам с add_zp_column + save.
+    Возвращает (период, сумма ЗП, строк данных).
+    """
+    book, values_book = _open_zp_source(file_path)
+    try:
+        sheet = book.active
+        output = Workbook(write_only=True)
+        targets = [output.create_sheet(source.title) for source in book.worksheets]
+        for source, target in zip(book.worksheets, targets):
+            if source is not sheet:
+                copy_sheet_streaming(source, target)
+        output.active = book.index(sheet)
+
+        period, total, rows, formula_values = write_zp_sheet(
+            sheet,
+            targets[book.index(sheet)],
+            compute,
+            chunk_rows,
+            values_book.active if values_book is not None else None,
+            formula_mode,
+        )
+        output.save(export_path)
+        store_formula_values(export_path, {book.index(sheet) + 1: formula_values})
+        return period, total, rows
+    finally:
+        if values_book is not None:
+            values_book.close()
+        book.close()
+
+
+class ConsolidatedWorkbook:
+    """Все результаты расчета одной книгой: ведомость и лист на каждого сотрудника.
+
+    Книга write-only: лист сотрудника пишется построчно сразу при расчете
+    (как в stream_zp_workbook), ведомость - первым листом в конце расчета,
+    и весь файл сохраняется один раз.
+    """
+
+    def __init__(self, summary_title: str = SUMMARY_SHEET_TITLE, formula_mode: str = "formula"):
+        self.book = Workbook(write_only=True)
+        self.summary_sheet = self.book.create_sheet(summary_title)
+        self.formula_mode = formula_mode
+        # лист -> значения его формул (formula_mode="cached")
+        self.formula_values: dict = {}
+
+    def add_employee(
+        self, file_path: Path, title: str, compute, chunk_rows: int = STREAM_CHUNK_ROWS
+    ) -> tuple[str, float, int]:
+        """Лист сотрудника со столбцом ЗП; название листа - title и период.
+
+        Возвращает (период, сумма ЗП, строк данных). При ошибке лист удаляется.
+        """
+        book, values_book = _open_zp_source(file_path)
+        target = self.book.create_sheet(sheet_title(title))
+        try:
+            period, total, rows, formula_values = write_zp_sheet(
+                book.active,
+                target,
+                compute,
+                chunk_rows,
+                values_book.active if values_book is not None else None,
+                self.formula_mode,
+            )
+        except Exception:
+            # Недописанный лист закрываем (его временный файл) и убираем из книги
+            target.close()
+            self.book.remove(target)
+            raise
+        finally:
+            if values_book is not None:
+                values_book.close()
+            book.close()
+        # Период известен только после чтения листа
+        target.title = self.unique_title(f"{title} {period}")
+        self.formula_values[target] = formula_values
+        return period, total, rows
+
+    def unique_title(self, title: str) -> str:
+        """Название листа; повтор (тот же сотрудник и период) - с номером: "Иванова ... (2)"."""
+        names = {name.lower() for name in self.book.sheetnames}
+        candidate = sheet_title(title)
+        number = 1
+        while candidate.lower() in names:
+            number += 1
+            suffix = f" ({number})"
+            candidate = sheet_title(title)[: SHEET_TITLE_LENGTH - len(suffix)] + suffix
+        return candidate
+
+    def write_summary(
+        self, rows: list[list], header_rows: int = 1, formula_values: dict[str, float] | None = None
+    ) -> None:
+        """Строки ведомости; первые header_rows - заголовок (как у pandas.to_excel).
+
+        formula_values - значения формул ведомости по адресам ячеек.
+        """
+        for row_idx, row in enumerate(rows):
+            if row_idx < header_rows:
+                row = [self._header_cell(value) for value in row]
+            self.summary_sheet.append(row)
+        if formula_values:
+            self.formula_values[self.summary_sheet] = formula_values
+
+    def _header_cell(self, value) -> WriteOnlyCell:
+        cell = WriteOnlyCell(self.summary_sheet, value)
+        cell.font = _HEADER_FONT
+        cell.border = _HEADER_BORDER
+        cell.alignment = _HEADER_ALIGNMENT
+        return cell
+
+    def save(self, file_path: Path) -> None:
+        self.book.save(file_path)
+        store_formula_values(
+            file_path, {self.book.index(sheet) + 1: values for sheet, values in self.formula_values.items()}
+        )
+
+
+def sheet_title(title: str) -> str:
+    """Допустимое название листа Excel: без символов []:*?/\\ и не длиннее 31 символа."""
+    return _INVALID_TITLE_CHARS.sub("_", title)[:SHEET_TITLE_LENGTH].strip() or "Лист"
+
+
+class _ZpColumnStream:
+    """Построчная запись листа со столбцом ЗП для stream_zp_workbook.
+
+    Раскладка как в add_zp_column: столбец ЗП после последнего столбца,
+    столбцы E, G и H удалены, формула SUM - на месте ЗП последней строки
+    данных. Строки до последней непустой - строки данных, они считаются и
+    пишутся кусками по chunk_rows. Последняя непустая строка и пустые строки
+    после нее ждут: пустые строки в конце листа строками данных не считаются.
+    Пустые строки хранятся сериями одинаковых, так что и длинный хвост
+    отформатированных пустых строк память не растит.
+    """
+
+    _NO_ZP = object()
+
+    def __init__(
+        self, target, width: int, compute, formula_mode: str = "formula", chunk_rows: int = STREAM_CHUNK_ROWS
+    ):
+        self.target = target
+        self.width = width
+        self.compute = compute
+        self.formula_mode = formula_mode
+        self.chunk_rows = max(chunk_rows, 1)
+        self.formula_values: dict[str, float] = {}
+        self.copy_style = _StyleCopier(target)
+        self.zp_column = width + 1
+        # Номер столбца ЗП после удаления трех столбцов
+        self.sum_column = self.zp_column - len(DELETED_COLUMNS)
+
+        # (ячейки, значения) строк данных, которые еще не посчитаны
+        self.chunk: list[tuple[tuple, tuple]] = []
+        # последняя непустая строка и пустые строки после нее: [ключ, ячейки, значения, сколько]
+        self.last: tuple[tuple, tuple] | None = None
+        self.empty_runs: list[list] = []
+        self.period_rows: list[tuple] = []
+        self.data_rows = 0
+        self.total = 0
+
+    def write_header(self, cells: tuple) -> None:
+        self.target.append(self.row_values(cells))
+
+    def add(self, cells: tuple, values: tuple | None) -> None:
+        if values is None:
+            values = tuple(cell.value for cell in cells)
+        values = values + (None,) * (self.width - len(values))
+        if len(self.period_rows) < PERIOD_ROWS:
+            self.period_rows.append(values)
+
+        if any(value is not None for value in values):
+            # Ждавшие строки оказались строками данных
+            if self.last is not None:
+                self.append_data(self.last)
+            for _, run_cells, run_values, count in self.empty_runs:
+                for _ in range(count):
+                    self.append_data((run_cells, run_values))
+            self.empty_runs = []
+            self.last = (cells, values)
+            return
+
+        # Одинаковые пустые строки (стили и формулы без значений) - одна серия
+        key = tuple((_style_key(cell), cell.value) for cell in cells)
+        if self.empty_runs and self.empty_runs[-1][0] == key:
+            self.empty_runs[-1][3] += 1
+        else:
+            self.empty_runs.append([key, cells, values, 1])
+
+    def append_data(self, row: tuple[tuple, tuple]) -> None:
+        self.chunk.append(row)
+        if len(self.chunk) >= self.chunk_rows:
+            self.write_rows(self.chunk)
+            self.chunk = []
+
+    def finish(self) -> None:
+        if self.last is None:
+            raise ValueError("Нет строк данных для столбца ЗП")
+        if self.chunk:
+            self.write_rows(self.chunk)
+            self.chunk = []
+        self.write_rows([self.last], final=True)
+        self.last = None
+        # Пустые строки в конце листа - без ЗП
+        for _, cells, _, count in self.empty_runs:
+            values = self.row_values(cells)
+            for _ in range(count):
+                self.target.append(values)
+        self.empty_runs = []
+
+    def write_rows(self, rows: list[tuple[tuple, tuple]], final: bool = False) -> None:
+        count = len(rows)
+        zp_row = self.compute([values for _, values in rows], self.data_rows + 2)
+        self.data_rows += count
+        for idx, ((cells, _), zp) in enumerate(zip(rows, zp_row), start=1):
+            # SUM в последней строке - по строкам данных до нее
+            sum_value = self.total
+            if isinstance(zp, (int, float)):
+                self.total += zp
+            values = self.row_values(cells, zp)
+            if final and idx == count:
+                sum_letter = get_column_letter(self.sum_column)
+                values.extend([None] * (self.sum_column - len(values)))
+                if self.formula_mode == "values":
+                    values[self.sum_column - 1] = sum_value
+                else:
+                    values[self.sum_column - 1] = f"=SUM({sum_letter}2:{sum_letter}{self.data_rows})"
+                    if self.formula_mode == "cached":
+                        self.formula_values[f"{sum_letter}{self.data_rows + 1}"] = sum_value
+            self.target.append(values)
+
+    def row_values(self, cells: tuple, zp=_NO_ZP) -> list:
+        values = _row_values(self.copy_style, cells)
+        values.extend([None] * (self.zp_column - len(values)))
+        if zp is not self._NO_ZP:
+            values[self.zp_column - 1] = zp
+        return [value for col, value in enumerate(values, start=1) if col not in DELETED_COLUMNS]
+
+
+def read_xls(file_path: Path) -> Workbook:
+    """Читает .xls через xlrd в книгу openpyxl.
+
+    Переносятся значения, объединения, ширина столбцов и высота строк, а из
+    форматов ячеек - числовой формат, полужирный/курсив шрифта, заливка,
+    границы и выравнивание. Прочие свойства шрифта (гарнитура, размер, цвет)
+    остаются по умолчанию.
+    """
+    import xlrd
+
+    xls_book = xlrd.open_workbook(str(file_path), formatting_info=True)
+    book = Workbook()
+    book.remove(book.active)
+    active = 0
+    # Индекс XF -> {атрибут ячейки: значение}, только отличные от умолчаний
+    styles = {}
+    for index, xls_sheet in enumerate(xls_book.sheets()):
+        sheet = book.create_sheet(xls_sheet.name)
+        if xls_sheet.sheet_selected and not active:
+            active = index
+        for row_idx in range(xls_sheet.nrows):
+            types = xls_sheet.row_types(row_idx)
+            values = xls_sheet.row_values(row_idx)
+            sheet.append([_xls_value(ctype, value, xls_book.datemode) for ctype, value in zip(types, values)])
+            for col_idx in range(len(values)):
+                xf_index = xls_sheet.cell_xf_index(row_idx, col_idx)
+                if xf_index not in styles:
+                    styles[xf_index] = _xls_style(xls_book, xf_index)
+                style = styles[xf_index]
+                if style:
+                    cell = sheet.cell(row=row_idx + 1, column=col_idx + 1)
+                    for attr, value in style.items():
+                        setattr(cell, attr, value)
+        if xls_sheet.standardwidth:
+            sheet.sheet_format.defaultColWidth = xls_sheet.standardwidth / 256
+        for col_idx, info in xls_sheet.colinfo_map.items():
+            sheet.column_dimensions[get_column_letter(col_idx + 1)].width = info.width / 256
+        for row_idx, info in xls_sheet.rowinfo_map.items():
+            if not info.has_default_height:
+                sheet.row_dimensions[row_idx + 1].height = info.height / 20
+        for row_lo, row_hi, col_lo, col_hi in xls_sheet.merged_cells:
+            sheet.merge_cells(
+                start_row=row_lo + 1, end_row=row_hi, start_column=col_lo + 1, end_column=col_hi
+            )
+    book.active = active
+    return book
+
+
+def _xls_style(xls_book, xf_index: int) -> dict:
+    """Оформление ячейки по формату (XF) .xls: {атрибут ячейки openpyxl: значение}."""
+    xf = xls_book.xf_list[xf_index]
+    style = {}
+
+    format_info = xls_book.format_map.get(xf.format_key)
+    if format_info is not None and format_info.format_str not in ("", "General"):
+        style["number_format"] = format_info.format_str
+
+    xls_font = xls_book.font_list[xf.font_index]
+    if xls_font.bold or xls_font.italic:
+        style["font"] = Font(bold=True if xls_font.bold else None, italic=True if xls_font.italic else None)
+
+    background = xf.background
+    if 0 < background.fill_pattern <= len(_XLS_FILL_PATTERNS):
+        colors = {
+            name: color
+            for name, colour_index in (
+                ("fgColor", background.pattern_colour_index),
+                ("bgColor", background.background_colour_index),
+            )
+            if (color := _xls_color(xls_book, colour_index)) is not None
+        }
+        style["fill"] = PatternFill(_XLS_FILL_PATTERNS[background.fill_pattern - 1], **colors)
+
+    border = xf.border
+    sides = {
+        side: Side(
+            style=_XLS_BORDER_STYLES[line_style] if line_style < len(_XLS_BORDER_STYLES) else "thin",
+            color=_xls_color(xls_book, getattr(border, f"{side}_colour_index")),
+        )
+        for side in ("left", "right", "top", "bottom")
+        if (line_style := getattr(border, f"{side}_line_style"))
+    }
+    if sides:
+        style["border"] = Border(**sides)
+
+    alignment = xf.alignment
+    attrs = {
+        "horizontal": _XLS_HORIZONTAL.get(alignment.hor_align),
+        "vertical": _XLS_VERTICAL.get(alignment.vert_align),
+        "wrap_text": True if alignment.text_wrapped else None,
+        "indent": alignment.indent_level or 0,
+        # 255 в .xls - вертикальный текст, в .xlsx это тоже 255
+        "text_rotation": alignment.rotation or 0,
+    }
+    if any(attrs.values()):
+        style["alignment"] = Alignment(**attrs)
+    return style
+
+
+def _xls_color(xls_book, colour_index: int) -> str | None:
+    """Цвет из палитры .xls как RRGGBB; системные цвета (нет в палитре) - None."""
+    rgb = xls_book.colour_map.get(colour_index)
+    return "{:02X}{:02X}{:02X}".format(*rgb) if rgb else None
+
+
+def _xls_value(ctype: int, value, datemode: int):
+    import xlrd
+
+    match ctype:
+        case xlrd.XL_CELL_EMPTY | xlrd.XL_CELL_BLANK:
+            return None
+        case xlrd.XL_CELL_NUMBER:
+            # В .xls все числа - double, целые пишем как int, как их сохраняет Excel
+            return int(value) if value.is_integer() else value
+        case xlrd.XL_CELL_DATE:
+            return xlrd.xldate.xldate_as_datetime(value, datemode)
+        case xlrd.XL_CELL_BOOLEAN:
+            return bool(value)
+        case xlrd.XL_CELL_ERROR:
+            return xlrd.error_text_from_code.get(value)
+    return value
+
+
+def convert_xls_with_excel(file_path: Path, xlsx_path: Path) -> Path:
+    """Сохраняет .xls как .xlsx по пути xlsx_path через Excel (xlwings)."""
+    import xlwings as xw
+
+    app = xw.App(visible=False)
+    try:
+        wb = app.books.open(str(file_path))
+        wb.save(str(xlsx_path))
+        wb.close()
+    finally:
+        app.quit()
+
+    return xlsx_path
+
+
+def load_xls(file_path: Path) -> Workbook:
+    """Книга .xls: через xlrd, а если он не справился - через Excel.
+
+    Файлы .xls, которые на деле являются .xlsx, открываются напрямую.
+    """
+    if is_xlsx_file(file_path):
+        with open(file_path, "rb") as file:
+            return load_workbook(file)
+    try:
+        return read_xls(file_path)
+    except Exception as xlrd_error:
+        try:
+            import xlwings  # noqa: F401
+        except ImportError:
+            raise xlrd_error
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xlsx_path = convert_xls_with_excel(file_path, Path(tmp_dir) / f"{file_path.stem}.xlsx")
+        return load_workbook(xlsx_path)
+
+
+def convert_xls_to_xlsx(file_path: Path, xlsx_path: Path) -> Path:
+    """Сохраняет .xls как .xlsx по пути xlsx_path."""
+    load_xls(file_path).save(xlsx_path)
+    return xlsx_path
+
+
+def _convert_task(file_path: Path, to_path: Path) -> Path:
+    return convert_xls_to_xlsx(file_path, to_path / f"{file_path.stem}.xlsx")
+
+
+def convert_xls_folder(from_path: Path, to_path: Path, workers: int = 1) -> list[tuple[str, str]]:
+    """Конвертирует все .xls из from_path в .xlsx в to_path параллельно.
+
+    Возвращает список (имя файла, ошибка) для файлов, которые не удалось сконвертировать.
+    """
+    files = sorted(file for file in from_path.iterdir() if file.suffix.lower() == ".xls")
+    to_path.mkdir(parents=True, exist_ok=True)
+    failed_files = []
+    with ProcessPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = {executor.submit(_convert_task, file, to_path): file for file in files}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failed_files.append((futures[future].name, str(e)))
+    return failed_files
+
+
+class EmployeeWorkbook:
+    """Книга сотрудника, разобранная за один проход.
+
+    rows - строки данных после заголовка (как их видит pd.read_excel),
+    period - период из шапки отчета, sheet - лист для изменения.
+    """
+
+    def __init__(self, book: Workbook, rows: list[tuple] | None = None):
+        self.book = book
+        self.sheet = self.book.active
+        # Значения формул для store_formula_values (formula_mode="cached")
+        self.formula_values: dict[str, float] = {}
+        if rows is None:
+            rows, _ = self._read_rows(self.sheet)
+        self.rows = rows
+
+    @classmethod
+    def load(cls, file_path: Path) -> "EmployeeWorkbook":
+        """Читает .xlsx или .xls (без запуска Excel, если это возможно)."""
+        if file_path.suffix.lower() == ".xls":
+            return cls(load_xls(file_path))
+
+        book = load_workbook(file_path)
+        rows, has_formulas = cls._read_rows(book.active)
+        if has_formulas:
+            # Для формул нужны сохраненные значения - читаем их отдельно
+            values_book = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                rows, _ = cls._read_rows(values_book.active)
+            finally:
+                values_book.close()
+        return cls(book, rows)
+
+    @classmethod
+    def load_rows(cls, file_path: Path) -> list[tuple]:
+        """Только строки данных (сохраненные значения), без стилей и модели листа."""
+        if file_path.suffix.lower() == ".xls":
+            rows, _ = cls._read_rows(load_xls(file_path).active)
+            return rows
+
+        book = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = [tuple(row) for row in book.active.iter_rows(values_only=True)]
+        finally:
+            book.close()
+        # Размеров листа в файле может не быть - ширина по самой длинной строке
+        width = max(map(len, rows), default=0)
+        rows = [row + (None,) * (width - len(row)) for row in rows[1:]]
+
+        # Пустые строки в конце листа pandas не читает
+        while rows and all(value is None for value in rows[-1]):
+            rows.pop()
+        return rows
+
+    @staticmethod
+    def _read_rows(sheet) -> tuple[list[tuple], bool]:
+        width = sheet.max_column or 0
+        has_formulas = False
+        rows = []
+        for cells in sheet.iter_rows(min_row=2):
+            values = []
+            for cell in cells:
+                if cell.data_type == "f":
+                    has_formulas = True
+                values.append(cell.value)
+            values.extend([None] * (width - len(values)))
+            rows.append(tuple(values))
+
+        # Пустые строки в конце листа pandas не читает
+        while rows and all(value is None for value in rows[-1]):
+            rows.pop()
+        return rows, has_formulas
+
+    @cached_property
+    def period(self) -> str:
+        return find_period(self.rows)
+
+    def add_zp_column(self, zp_row: list, formula_mode: str = "formula") -> None:
+        """Добавляет столбец ЗП со строкой SUM и удаляет столбцы E, G и H.
+
+        formula_mode - как записать SUM (см. Config.formula_mode).
+        """
+        sheet = self.sheet
+        new_column_index = sheet.max_column + 1
+
+        # Add the new column to the existing sheet
+        for idx, value in enumerate(
+            zp_row, start=2
+        ):  # Assuming header is in the first row
+            sheet.cell(row=idx, column=new_column_index, value=value)
+
+        # Удаляем столбцы E, G и H
+        cols_to_delete = ["H", "G", "E"]
+        for col in cols_to_delete:
+            sheet.delete_cols(sheet[col + "1"].column)
+        new_column_index = new_column_index - 3
+
+        sum_formula = f"=SUM({sheet.cell(row=2, column=new_column_index).coordinate}:{sheet.cell(row=len(zp_row), column=new_column_index).coordinate})"
+        sum_cell = sheet.cell(row=len(zp_row) + 1, column=new_column_index)
+        # SUM - по строкам 2..len(zp_row), т.е. без ЗП последней строки (ее место занимает формула)
+        sum_value = sum_numbers(zp_row[:-1])
+        if formula_mode == "values":
+            sum_cell.value = sum_value
+        else:
+            sum_cell.value = sum_formula
+            if formula_mode == "cached":
+                self.formula_values[sum_cell.coordinate] = sum_value
+
+    def save(self, file_path: Path) -> None:
+        self.book.save(file_path)
+        store_formula_values(file_path, {self.book.index(self.sheet) + 1: self.formula_values})
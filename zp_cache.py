@@ -0,0 +1,45 @@
+import pickle
+from pathlib import Path
+
+from utils import file_digest
+
+# Меняется при изменении формата кэша или разбора зарплатного файла
+ZP_CACHE_VERSION = 1
+
+
+def get_zp_cache_key(info_path: Path, similarity_ratio: float) -> dict:
+    """Ключ кэша: путь, время изменения, размер и хэш содержимого файла."""
+    stat = info_path.stat()
+    return {
+        "version": ZP_CACHE_VERSION,
+        "path": str(info_path.resolve()),
+        "mtime": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "hash": file_digest(info_path),
+        "similarity_ratio": similarity_ratio,
+    }
+
+
+def load_zp_cache(cache_path: Path, key: dict) -> dict | None:
+    """Данные из кэша, если ключ совпадает; иначе None."""
+    if not cache_path.exists():
+        return None
+    try:
+        with open(cache_path, "rb") as file:
+            cached_key = pickle.load(file)
+            if cached_key != key:
+                return None
+            return pickle.load(file)
+    except Exception as e:
+        print(f"Не удалось прочитать кэш зарплатного файла {cache_path}: {e}")
+        return None
+
+
+def save_zp_cache(cache_path: Path, key: dict, data: dict) -> None:
+    """Сохраняет ключ и данные; ключ идет первым, чтобы проверять его без чтения данных."""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as file:
+        pickle.dump(key, file, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path.replace(cache_path)